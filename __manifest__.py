@@ -57,8 +57,12 @@ Technical Features:
     },
     'data': [
         'security/ir.model.access.csv',
+        'data/ir_cron.xml',
+        'data/pos_bom_component_index_data.xml',
         'views/product_template_views.xml',
         'views/pos_order_views.xml',
+        'views/pos_config_views.xml',
+        'views/pos_bom_parked_order_views.xml',
     ],
     'demo': [
         'demo/demo_data.xml',
@@ -66,6 +70,10 @@ Technical Features:
     'assets': {
         'point_of_sale._assets_pos': [
             'pos_bom_integration/static/src/js/pos_bom_integration.js',
+            'pos_bom_integration/static/src/xml/pos_bom_integration.xml',
+        ],
+        'web.assets_tests': [
+            'pos_bom_integration/static/tests/tours/**/*',
         ],
     },
     'images': [
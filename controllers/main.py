@@ -0,0 +1,31 @@
+from werkzeug.exceptions import Forbidden
+
+from odoo import http
+from odoo.http import request
+
+from ..models import bom_metrics
+
+
+class PosBomMetricsController(http.Controller):
+
+    @http.route('/pos_bom_integration/metrics', type='http', auth='user', methods=['GET'])
+    def bom_metrics(self, config_id=None, format='json'):
+        """Expose the BOM operation metrics of the worker serving the request
+        Args:
+            config_id: ID of a POS config to restrict the samples to (optional)
+            format: 'json' (default) or 'prometheus' for the text exposition format
+        """
+        if not request.env.user.has_group('point_of_sale.group_pos_manager'):
+            raise Forbidden()
+        
+        config_id = int(config_id) if config_id else None
+        summary = bom_metrics.summarize(bom_metrics.get_samples(request.env.cr.dbname, config_id))
+        if format == 'prometheus':
+            return request.make_response(
+                bom_metrics.format_prometheus(summary),
+                headers=[('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')]
+            )
+        return request.make_json_response({
+            'config_id': config_id,
+            'operations': summary,
+        })
@@ -1,3 +1,11 @@
 from . import product_template
 from . import pos_order
 from . import pos_order_line
+from . import pos_session
+from . import mrp_bom
+from . import pos_bom_component_index
+from . import pos_bom_reservation
+from . import pos_bom_consumption
+from . import pos_bom_stock_delta
+from . import stock_quant
+from . import pos_bom_parked_order
@@ -0,0 +1,99 @@
+"""Per-worker instrumentation of the BOM hot paths
+
+Every instrumented call appends one sample (wall time, SQL query count and
+component count) to a bounded ring buffer living in the worker process.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+RING_BUFFER_SIZE = 2000
+
+_samples = deque(maxlen=RING_BUFFER_SIZE)
+_lock = threading.Lock()
+
+
+@contextmanager
+def bom_timer(env, operation, config_id=None):
+    """Measure a BOM operation and record it in the ring buffer
+    Yields the sample dict, so the caller can set its 'components' count.
+    """
+    cr = env.cr
+    start = time.perf_counter()
+    start_queries = cr.sql_log_count
+    sample = {
+        'operation': operation,
+        'config_id': config_id,
+        'components': 0,
+    }
+    try:
+        yield sample
+    finally:
+        sample.update({
+            'dbname': cr.dbname,
+            'timestamp': time.time(),
+            'duration': time.perf_counter() - start,
+            'queries': cr.sql_log_count - start_queries,
+        })
+        with _lock:
+            _samples.append(sample)
+
+
+def get_samples(dbname, config_id=None):
+    """Get the recorded samples of a database, optionally of one POS config"""
+    with _lock:
+        samples = list(_samples)
+    return [
+        sample for sample in samples
+        if sample['dbname'] == dbname and (config_id is None or sample['config_id'] == config_id)
+    ]
+
+
+def summarize(samples):
+    """Aggregate samples per operation
+    Returns dict mapping operation to count, total/avg/max/p95 duration and
+    avg/max queries and components
+    """
+    by_operation = {}
+    for sample in samples:
+        by_operation.setdefault(sample['operation'], []).append(sample)
+    
+    summary = {}
+    for operation, operation_samples in by_operation.items():
+        durations = sorted(sample['duration'] for sample in operation_samples)
+        queries = [sample['queries'] for sample in operation_samples]
+        components = [sample['components'] for sample in operation_samples]
+        count = len(operation_samples)
+        summary[operation] = {
+            'count': count,
+            'duration_total': sum(durations),
+            'duration_avg': sum(durations) / count,
+            'duration_max': durations[-1],
+            'duration_p95': durations[min(count - 1, int(count * 0.95))],
+            'queries_avg': sum(queries) / count,
+            'queries_max': max(queries),
+            'components_avg': sum(components) / count,
+            'components_max': max(components),
+        }
+    return summary
+
+
+def format_prometheus(summary):
+    """Render a summary in the Prometheus text exposition format"""
+    metrics = [
+        ('pos_bom_operation_calls_total', 'counter', 'Number of instrumented calls', 'count'),
+        ('pos_bom_operation_duration_seconds_total', 'counter', 'Total wall time', 'duration_total'),
+        ('pos_bom_operation_duration_seconds_max', 'gauge', 'Slowest call wall time', 'duration_max'),
+        ('pos_bom_operation_duration_seconds_p95', 'gauge', '95th percentile wall time', 'duration_p95'),
+        ('pos_bom_operation_queries_avg', 'gauge', 'Average SQL queries per call', 'queries_avg'),
+        ('pos_bom_operation_queries_max', 'gauge', 'Maximum SQL queries per call', 'queries_max'),
+        ('pos_bom_operation_components_avg', 'gauge', 'Average components per call', 'components_avg'),
+    ]
+    lines = []
+    for name, metric_type, help_text, key in metrics:
+        lines.append(f'# HELP {name} {help_text} (ring buffer of this worker)')
+        lines.append(f'# TYPE {name} {metric_type}')
+        for operation, values in sorted(summary.items()):
+            lines.append(f'{name}{{operation="{operation}"}} {values[key]}')
+    return '\n'.join(lines) + '\n'
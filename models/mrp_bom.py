@@ -0,0 +1,77 @@
+from odoo import models, api
+
+# Fields whose change alters the components a BOM explodes into
+BOM_INDEX_FIELDS = {
+    'product_tmpl_id', 'product_id', 'product_qty', 'product_uom_id',
+    'type', 'active', 'sequence', 'bom_line_ids',
+}
+BOM_LINE_INDEX_FIELDS = {'bom_id', 'product_id', 'product_qty', 'product_uom_id'}
+
+
+class MrpBom(models.Model):
+    _inherit = 'mrp.bom'
+
+    def _get_pos_bom_kits(self):
+        """Get the products of the kit BOMs in self"""
+        return self.filtered(lambda b: b.type == 'phantom').product_tmpl_id
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Override to reindex the POS BOM components"""
+        # Lines created along with the BOMs are indexed once, below
+        records = super(MrpBom, self.with_context(pos_bom_skip_index=True)).create(vals_list)
+        records = records.with_env(self.env)
+        self.env['pos.bom.component.index']._update_templates(records.product_tmpl_id, records._get_pos_bom_kits())
+        return records
+
+    def write(self, vals):
+        """Override to reindex the POS BOM components"""
+        if not BOM_INDEX_FIELDS.intersection(vals):
+            return super().write(vals)
+        templates = self.product_tmpl_id
+        kits = self._get_pos_bom_kits()
+        res = super(MrpBom, self.with_context(pos_bom_skip_index=True)).write(vals)
+        self.env['pos.bom.component.index']._update_templates(
+            templates | self.product_tmpl_id, kits | self._get_pos_bom_kits()
+        )
+        return res
+
+    def unlink(self):
+        """Override to reindex the POS BOM components"""
+        templates = self.product_tmpl_id
+        kits = self._get_pos_bom_kits()
+        res = super().unlink()
+        self.env['pos.bom.component.index']._update_templates(templates, kits)
+        return res
+
+
+class MrpBomLine(models.Model):
+    _inherit = 'mrp.bom.line'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Override to reindex the POS BOM components"""
+        records = super().create(vals_list)
+        if not self.env.context.get('pos_bom_skip_index'):
+            self.env['pos.bom.component.index']._update_templates(
+                records.bom_id.product_tmpl_id, records.bom_id._get_pos_bom_kits()
+            )
+        return records
+
+    def write(self, vals):
+        """Override to reindex the POS BOM components"""
+        if self.env.context.get('pos_bom_skip_index') or not BOM_LINE_INDEX_FIELDS.intersection(vals):
+            return super().write(vals)
+        boms = self.bom_id
+        res = super().write(vals)
+        boms |= self.bom_id
+        self.env['pos.bom.component.index']._update_templates(boms.product_tmpl_id, boms._get_pos_bom_kits())
+        return res
+
+    def unlink(self):
+        """Override to reindex the POS BOM components"""
+        boms = self.bom_id
+        res = super().unlink()
+        if not self.env.context.get('pos_bom_skip_index'):
+            self.env['pos.bom.component.index']._update_templates(boms.product_tmpl_id, boms._get_pos_bom_kits())
+        return res
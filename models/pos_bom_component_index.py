@@ -0,0 +1,229 @@
+import hashlib
+import json
+from collections import defaultdict
+
+from odoo import models, fields, api, tools
+from odoo.tools.lru import LRU
+
+# Products whose components are kept in memory per worker
+COMPONENT_CACHE_SIZE = 4096
+# Per-worker counters for the component cache
+_COMPONENT_CACHE_STATS = {'hits': 0, 'misses': 0}
+
+
+class PosBomComponentIndex(models.Model):
+    _name = 'pos.bom.component.index'
+    _description = 'POS BOM Component Index'
+    _order = 'template_id, sequence'
+    _log_access = False
+
+    template_id = fields.Many2one(
+        'product.template',
+        string='Product',
+        required=True,
+        ondelete='cascade'
+    )
+    
+    bom_id = fields.Many2one(
+        'mrp.bom',
+        string='Bill of Materials',
+        required=True,
+        ondelete='cascade'
+    )
+    
+    component_id = fields.Many2one(
+        'product.product',
+        string='Component',
+        required=True,
+        index=True,
+        ondelete='cascade'
+    )
+    
+    quantity = fields.Float(
+        string='Quantity per Unit',
+        help='Quantity of the component consumed by one unit of the product, in the component UoM'
+    )
+    
+    uom_id = fields.Many2one('uom.uom', string='Unit of Measure', required=True)
+    level = fields.Integer(string='Level', help='Depth of the kit the component comes from')
+    sequence = fields.Integer(string='Sequence')
+
+    def init(self):
+        # Components are always read per product, in explosion order
+        tools.create_index(
+            self._cr, 'pos_bom_component_index_template_sequence_index',
+            self._table, ['template_id', 'sequence']
+        )
+
+    @api.model
+    @tools.ormcache()
+    def _get_component_cache(self):
+        """Get the LRU of the components read per product
+        Held in the registry cache, so it is dropped in every worker whenever
+        the index changes and the registry cache is cleared.
+        """
+        return LRU(COMPONENT_CACHE_SIZE)
+
+    @api.model
+    def _get_components(self, template_ids):
+        """Read the flattened components of several products
+        Products missing from the component cache are read with one indexed query.
+        Returns dict mapping template ID to a list of (component ID, quantity
+        per unit, UoM ID, level) tuples
+        """
+        cache = self._get_component_cache()
+        result = {}
+        missing = []
+        for template_id in dict.fromkeys(template_ids):
+            components = cache.get(template_id)
+            if components is None:
+                missing.append(template_id)
+            else:
+                result[template_id] = list(components)
+        _COMPONENT_CACHE_STATS['hits'] += len(result)
+        _COMPONENT_CACHE_STATS['misses'] += len(missing)
+        if not missing:
+            return result
+        
+        fetched = {template_id: [] for template_id in missing}
+        self.flush_model()
+        self.env.cr.execute("""
+            SELECT template_id, component_id, quantity, uom_id, level
+              FROM pos_bom_component_index
+             WHERE template_id = ANY(%s)
+          ORDER BY template_id, sequence
+        """, [missing])
+        for template_id, component_id, quantity, uom_id, level in self.env.cr.fetchall():
+            fetched[template_id].append((component_id, quantity, uom_id, level))
+        for template_id, components in fetched.items():
+            cache[template_id] = tuple(components)
+            result[template_id] = components
+        return result
+
+    @api.model
+    def _get_cache_stats(self):
+        """Get the hit and miss counters of the component cache of this worker"""
+        return dict(_COMPONENT_CACHE_STATS)
+
+    @api.model
+    def _get_bom_ids(self, template_ids):
+        """Get the indexed BOM of several products with one indexed query
+        Returns dict mapping template ID to the ID of its BOM
+        """
+        if not template_ids:
+            return {}
+        self.flush_model()
+        self.env.cr.execute("""
+            SELECT DISTINCT template_id, bom_id
+              FROM pos_bom_component_index
+             WHERE template_id = ANY(%s)
+        """, [list(template_ids)])
+        return dict(self.env.cr.fetchall())
+
+    @api.model
+    def _get_catalog_versions(self, template_ids):
+        """Get the version of the indexed components of several products
+        Reindexing a product replaces its rows, so the highest row ID changes
+        with every change of its components. Component names are translated
+        and row IDs are per database, so versions are scoped by both.
+        Returns:
+            dict: {'version': hash of the whole catalog, 'scope': database and
+            language the versions are valid for, 'templates': dict mapping
+            template ID to the version of its components}
+        """
+        scope = f"{self.env.cr.dbname}/{self.env.lang or 'en_US'}"
+        versions = {}
+        if template_ids:
+            self.flush_model()
+            self.env.cr.execute("""
+                SELECT template_id, MAX(id)
+                  FROM pos_bom_component_index
+                 WHERE template_id = ANY(%s)
+              GROUP BY template_id
+            """, [list(template_ids)])
+            versions = {template_id: f'{scope}/{max_id}' for template_id, max_id in self.env.cr.fetchall()}
+        catalog = json.dumps([scope, sorted(versions.items())])
+        return {
+            'version': hashlib.sha1(catalog.encode()).hexdigest(),
+            'scope': scope,
+            'templates': versions,
+        }
+
+    @api.model
+    def _get_component_ids(self):
+        """Get the IDs of every indexed component"""
+        self.flush_model()
+        self.env.cr.execute("SELECT DISTINCT component_id FROM pos_bom_component_index")
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.model
+    def _rebuild(self, templates):
+        """Recompute the index rows of some products
+        Only products sold with their BOM in POS are indexed, their first active
+        BOM is exploded through its kits. The index is derived data, it is
+        maintained whatever the rights of the user changing the BOMs. Rows of
+        products whose components did not change are kept.
+        Returns whether any row changed
+        """
+        self = self.sudo()
+        templates = templates.sudo()
+        
+        ProductTemplate = self.env['product.template']
+        new_rows = defaultdict(list)
+        for template in templates.filtered(lambda t: t.use_bom_in_pos):
+            bom = template.bom_ids.filtered(lambda b: b.active)[:1]
+            if not bom:
+                continue
+            new_rows[template.id] = [
+                (bom.id, component['product_id'], component['quantity'], component['uom_id'], component['level'], sequence)
+                for sequence, component in enumerate(ProductTemplate._flatten_product_bom(template, bom))
+            ]
+        
+        existing = self.search([('template_id', 'in', templates.ids)])
+        old_rows = defaultdict(list)
+        for row in existing:
+            old_rows[row.template_id.id].append(
+                (row.bom_id.id, row.component_id.id, row.quantity, row.uom_id.id, row.level, row.sequence)
+            )
+        changed_ids = {template_id for template_id in templates.ids if old_rows[template_id] != new_rows[template_id]}
+        if not changed_ids:
+            return False
+        
+        existing.filtered(lambda row: row.template_id.id in changed_ids).unlink()
+        self.create([{
+            'template_id': template_id,
+            'bom_id': bom_id,
+            'component_id': component_id,
+            'quantity': quantity,
+            'uom_id': uom_id,
+            'level': level,
+            'sequence': sequence,
+        } for template_id in changed_ids for bom_id, component_id, quantity, uom_id, level, sequence in new_rows[template_id]])
+        return True
+
+    @api.model
+    def _update_templates(self, templates, kits=None):
+        """Reindex the POS products among templates after a BOM change
+        Args:
+            templates: product.template records whose BOMs changed
+            kits: product.template records (optional) whose kit BOMs changed,
+            the products using them as a kit are reindexed too
+        """
+        templates = templates.sudo()
+        walked = todo = kits.sudo() if kits else templates.browse()
+        while todo:
+            boms = self.env['mrp.bom.line'].sudo().search([('product_id.product_tmpl_id', 'in', todo.ids)]).bom_id
+            templates |= boms.product_tmpl_id
+            todo = boms.filtered(lambda b: b.type == 'phantom').product_tmpl_id - walked
+            walked |= todo
+        if self._rebuild(templates.filtered(lambda t: t.use_bom_in_pos)):
+            self.env.registry.clear_cache()
+
+    @api.model
+    def _rebuild_all(self):
+        """Rebuild the whole index, run on module installation and update"""
+        templates = self.env['product.template'].search([('use_bom_in_pos', '=', True)])
+        # Rows of products no longer sold with their BOM are dropped as well
+        templates |= self.sudo().search([]).template_id
+        if self._rebuild(templates):
+            self.env.registry.clear_cache()
@@ -0,0 +1,286 @@
+import logging
+import threading
+from collections import defaultdict
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+MAX_POSTING_ATTEMPTS = 5
+
+
+class PosBomConsumption(models.Model):
+    _name = 'pos.bom.consumption'
+    _description = 'POS BOM Component Consumption'
+    _order = 'id'
+
+    order_id = fields.Many2one(
+        'pos.order',
+        string='Order',
+        required=True,
+        index=True,
+        ondelete='cascade'
+    )
+    
+    session_id = fields.Many2one(
+        related='order_id.session_id',
+        store=True,
+        index=True
+    )
+    
+    name = fields.Char(string='Description', required=True)
+    
+    product_id = fields.Many2one(
+        'product.product',
+        string='Component',
+        required=True,
+        ondelete='restrict'
+    )
+    
+    quantity = fields.Float(
+        string='Quantity',
+        digits='Product Unit of Measure'
+    )
+    
+    product_uom_id = fields.Many2one('uom.uom', string='Unit of Measure', required=True)
+    location_id = fields.Many2one('stock.location', string='Source Location', required=True)
+    location_dest_id = fields.Many2one('stock.location', string='Destination Location', required=True)
+    picking_type_id = fields.Many2one('stock.picking.type', string='Operation Type')
+    company_id = fields.Many2one('res.company', string='Company', required=True)
+    
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('done', 'Posted'),
+        ('failed', 'Failed'),
+    ], string='Status', default='pending', required=True, index=True)
+    
+    move_id = fields.Many2one(
+        'stock.move',
+        string='Stock Move',
+        ondelete='set null'
+    )
+    
+    attempts = fields.Integer(string='Posting Attempts', default=0)
+    error = fields.Text(string='Last Error')
+
+    @api.model
+    def _prepare_from_move_vals(self, order, move_vals):
+        """Convert BOM stock move values into consumption values"""
+        return {
+            'order_id': order.id,
+            'name': move_vals['name'],
+            'product_id': move_vals['product_id'],
+            'quantity': move_vals['product_uom_qty'],
+            'product_uom_id': move_vals['product_uom'],
+            'location_id': move_vals['location_id'],
+            'location_dest_id': move_vals['location_dest_id'],
+            'picking_type_id': move_vals['picking_type_id'],
+            'company_id': move_vals['company_id'],
+        }
+
+    @api.model
+    def _get_pending_qty(self, component_ids, location=None, exclude=None):
+        """Get the recorded consumption not posted to stock yet in one grouped read
+        Args:
+            component_ids: list of component product IDs
+            location: stock.location record (optional), only count consumption
+            taken from this location tree
+            exclude: pos.bom.consumption records (optional) not to count
+        Returns dict mapping component product ID to pending quantity
+        """
+        pending = dict.fromkeys(component_ids, 0.0)
+        if not component_ids:
+            return pending
+        
+        domain = [
+            ('product_id', 'in', list(component_ids)),
+            ('state', 'in', ('pending', 'failed')),
+        ]
+        if location:
+            domain.append(('location_id.parent_path', '=like', f'{location.parent_path}%'))
+        if exclude:
+            domain.append(('id', 'not in', exclude.ids))
+        
+        groups = self._read_group(domain, ['product_id'], ['quantity:sum'])
+        for product, quantity in groups:
+            pending[product.id] = quantity
+        return pending
+
+    def _record_stock_deltas(self, sign):
+        """Notify POS sessions of the stock the consumptions take or give back
+        Recorded consumption is no longer available to POS sessions, posting it
+        gives it back as its stock move takes it from the quants instead.
+        """
+        vals_list = [{
+            'location_id': consumption.location_id.id,
+            'product_id': consumption.product_id.id,
+            'quantity': sign * consumption.quantity,
+        } for consumption in self]
+        if sign > 0:
+            for vals in vals_list:
+                vals['session_id'] = False
+        self.env['pos.bom.stock.delta']._record(vals_list)
+
+    def _prepare_move_vals(self):
+        """Convert the consumption back into stock move values"""
+        self.ensure_one()
+        return {
+            'name': self.name,
+            'product_id': self.product_id.id,
+            'product_uom': self.product_uom_id.id,
+            'product_uom_qty': self.quantity,
+            'location_id': self.location_id.id,
+            'location_dest_id': self.location_dest_id.id,
+            'company_id': self.company_id.id,
+            'state': 'draft',
+            'origin': self.order_id.name,
+            'date': fields.Datetime.now(),
+            'picking_type_id': self.picking_type_id.id,
+        }
+
+    def _post(self):
+        """Create and process the stock moves of the consumptions in self
+        The orders were accepted when they were sold, their stock is not
+        checked again, see _flag_stock_conflicts.
+        """
+        self._flag_stock_conflicts(', '.join(self.order_id.mapped('name')))
+        PosOrderLine = self.env['pos.order.line']
+        move_vals_list = [consumption._prepare_move_vals() for consumption in self]
+        moves = PosOrderLine._create_bom_stock_moves(move_vals_list, [])
+        for consumption, move in zip(self, moves):
+            consumption.move_id = move
+        PosOrderLine._done_bom_stock_moves(moves)
+        self.write({'state': 'done', 'error': False})
+        self._record_stock_deltas(1)
+
+    def _get_stock_shortfall_orders(self):
+        """Get the orders of the consumptions their location is short of stock for"""
+        required = defaultdict(float)
+        for consumption in self:
+            required[consumption.location_id.id, consumption.product_id.id] += consumption.quantity
+        
+        short_keys = set()
+        ProductTemplate = self.env['product.template']
+        for location in self.location_id:
+            product_ids = [product_id for location_id, product_id in required if location_id == location.id]
+            available = ProductTemplate._get_bom_components_available_qty(product_ids, location)
+            short_keys.update(
+                (location.id, product_id) for product_id in product_ids
+                if available[product_id] < required[location.id, product_id]
+            )
+        return self.filtered(
+            lambda c: (c.location_id.id, c.product_id.id) in short_keys
+        ).order_id
+
+    def _flag_stock_conflicts(self, origin):
+        """Flag the orders whose components are short by the time they are posted
+        Such orders are posted anyway, posting never undoes an accepted sale,
+        and they are flagged with a stock conflict like the orders validated
+        offline.
+        """
+        conflict_orders = self._get_stock_shortfall_orders()
+        if conflict_orders:
+            _logger.warning(
+                "BOM consumption of %s exceeds the stock, orders flagged: %s",
+                origin, ', '.join(conflict_orders.mapped('name'))
+            )
+            conflict_orders.bom_reconciliation_state = 'conflict'
+
+    def _post_aggregated(self, origin):
+        """Post the consumptions in self as one stock move per component and location
+        Every consumption keeps a link to the move it was aggregated into. The
+        orders were accepted when they were sold, their stock is not checked
+        again, see _flag_stock_conflicts.
+        """
+        self._flag_stock_conflicts(origin)
+        
+        groups = defaultdict(lambda: self.browse())
+        for consumption in self:
+            key = (
+                consumption.product_id, consumption.product_uom_id, consumption.location_id,
+                consumption.location_dest_id, consumption.picking_type_id, consumption.company_id,
+            )
+            groups[key] |= consumption
+        
+        move_vals_list = []
+        for (product, uom, location, location_dest, picking_type, company), consumptions in groups.items():
+            move_vals_list.append({
+                'name': f"POS BOM: {origin} - {product.name}",
+                'product_id': product.id,
+                'product_uom': uom.id,
+                'product_uom_qty': sum(consumptions.mapped('quantity')),
+                'location_id': location.id,
+                'location_dest_id': location_dest.id,
+                'company_id': company.id,
+                'state': 'draft',
+                'origin': origin,
+                'date': fields.Datetime.now(),
+                'picking_type_id': picking_type.id,
+            })
+        
+        PosOrderLine = self.env['pos.order.line']
+        moves = PosOrderLine._create_bom_stock_moves(move_vals_list, [])
+        for consumptions, move in zip(groups.values(), moves):
+            consumptions.move_id = move
+        PosOrderLine._done_bom_stock_moves(moves)
+        self.write({'state': 'done', 'error': False})
+        self._record_stock_deltas(1)
+        self.order_id._update_bom_stock_state()
+        return moves
+
+    def _post_by_order(self):
+        """Post the consumptions in self, isolating the orders that fail
+        Everything is posted in one batch first. If that fails, every order
+        is retried under its own savepoint so one bad order cannot block the
+        others, and the failing ones are scheduled for another attempt.
+        """
+        try:
+            with self.env.cr.savepoint():
+                self._post()
+        except Exception:
+            for order in self.order_id:
+                consumptions = self.filtered(lambda c: c.order_id == order)
+                try:
+                    with self.env.cr.savepoint():
+                        consumptions._post()
+                except Exception as e:
+                    _logger.warning("Could not post BOM consumption of order %s: %s", order.name, e)
+                    attempts = max(consumptions.mapped('attempts')) + 1
+                    consumptions.write({
+                        'attempts': attempts,
+                        'error': str(e),
+                        'state': 'failed' if attempts >= MAX_POSTING_ATTEMPTS else 'pending',
+                    })
+        self.order_id._update_bom_stock_state()
+
+    @api.model
+    def _get_pending_domain(self):
+        """Domain of the consumptions the queue should post
+        Every pending consumption is posted by the queue, except the one of the
+        sessions still open in session mode, which their closing posts. The
+        deduction mode of a POS config may change while consumption is pending.
+        """
+        return [
+            ('state', '=', 'pending'),
+            '|',
+            ('session_id.state', '=', 'closed'),
+            ('session_id.config_id.bom_stock_deduction', '!=', 'session'),
+        ]
+
+    @api.model
+    def _cron_post_pending_consumption(self, batch_size=200):
+        """Post queued BOM consumption, a batch of orders at a time
+        Each order is attempted at most once per run, failures are retried
+        by the next run.
+        """
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        processed_order_ids = []
+        while True:
+            domain = self._get_pending_domain() + [('order_id', 'not in', processed_order_ids)]
+            orders = self.search(domain, limit=batch_size * 20).order_id[:batch_size]
+            if not orders:
+                return
+            self.search(domain + [('order_id', 'in', orders.ids)])._post_by_order()
+            processed_order_ids += orders.ids
+            if auto_commit:
+                self.env.cr.commit()
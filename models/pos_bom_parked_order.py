@@ -0,0 +1,100 @@
+import json
+
+from odoo import models, fields, api
+
+
+class PosBomParkedOrder(models.Model):
+    _name = 'pos.bom.parked.order'
+    _description = 'POS Order Parked by BOM Sync'
+    _order = 'id desc'
+
+    name = fields.Char(string='Order Reference', required=True)
+    uid = fields.Char(string='Order UID', index=True)
+    
+    session_id = fields.Many2one(
+        'pos.session',
+        string='Session',
+        ondelete='set null'
+    )
+    
+    config_id = fields.Many2one(
+        related='session_id.config_id',
+        store=True
+    )
+    
+    order_data = fields.Text(string='Order Data', required=True, help='Order as sent by the POS')
+    reason = fields.Text(string='Reason')
+    details = fields.Text(string='Details', help='Structured reasons sent back to the POS')
+    
+    state = fields.Selection([
+        ('parked', 'To Review'),
+        ('synced', 'Synced'),
+        ('discarded', 'Discarded'),
+    ], string='Status', default='parked', required=True, index=True)
+    
+    pos_order_id = fields.Many2one('pos.order', string='POS Order', readonly=True)
+
+    @api.model
+    def _park(self, order, reason, errors=None):
+        """Park a UI order that could not be synced
+        An order parked again, after a failed retry, keeps its record.
+        Args:
+            order: UI order as passed to create_from_ui
+            reason: message explaining why the order was not synced
+            errors: list of BOM stock error dicts (optional)
+        Returns the failure entry sent back to the POS
+        """
+        order_data = order['data']
+        failure = {
+            'reason': reason,
+            'errors': [{
+                'component_id': error['component_id'],
+                'component_name': error['component_name'],
+                'available': error['available'],
+                'required': error['required'],
+            } for error in errors or []],
+        }
+        vals = {
+            'name': order_data.get('name'),
+            'uid': order_data.get('uid'),
+            'session_id': order_data.get('pos_session_id'),
+            'order_data': json.dumps(order),
+            'reason': reason,
+            'details': json.dumps(failure),
+            'state': 'parked',
+        }
+        
+        Parked = self.sudo()
+        parked = Parked.search([('uid', '=', vals['uid']), ('state', '=', 'parked')], limit=1) if vals['uid'] else Parked
+        if parked:
+            parked.write(vals)
+        else:
+            Parked.create(vals)
+        return {
+            'id': False,
+            'pos_reference': order_data.get('name'),
+            'account_move': False,
+            'bom_failure': failure,
+        }
+
+    @api.model
+    def _mark_synced(self, order_ids):
+        """Mark the parked entries of orders synced since as synced
+        Args:
+            order_ids: dict mapping order UID to the ID of its created pos.order
+        """
+        if not order_ids:
+            return
+        for parked in self.sudo().search([('uid', 'in', list(order_ids)), ('state', '=', 'parked')]):
+            parked.write({'state': 'synced', 'pos_order_id': order_ids[parked.uid]})
+
+    def action_retry_sync(self):
+        """Sync the parked orders again, the ones failing again stay parked
+        Synced orders are marked by create_from_ui, see _mark_synced.
+        """
+        for parked in self.filtered(lambda p: p.state == 'parked'):
+            self.env['pos.order'].create_from_ui([json.loads(parked.order_data)])
+
+    def action_discard(self):
+        """Drop the parked orders from the review queue"""
+        self.write({'state': 'discarded'})
@@ -0,0 +1,169 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from odoo import models, fields, api, tools
+
+DEFAULT_RESERVATION_TTL = 120  # seconds
+
+
+class PosBomReservation(models.Model):
+    _name = 'pos.bom.reservation'
+    _description = 'POS BOM Component Reservation'
+
+    session_id = fields.Many2one(
+        'pos.session',
+        string='Session',
+        required=True,
+        index=True,
+        ondelete='cascade'
+    )
+    
+    order_uid = fields.Char(
+        string='Order UID',
+        index=True,
+        help='UID of the POS order holding the components'
+    )
+    
+    product_id = fields.Many2one(
+        'product.product',
+        string='Component',
+        required=True,
+        ondelete='cascade'
+    )
+    
+    location_id = fields.Many2one(
+        'stock.location',
+        string='Location',
+        ondelete='cascade',
+        help='Source location of the POS holding the components'
+    )
+    
+    quantity = fields.Float(
+        string='Quantity',
+        digits='Product Unit of Measure'
+    )
+    
+    expiration_date = fields.Datetime(
+        string='Expires On',
+        required=True
+    )
+
+    def init(self):
+        # Active holds are always looked up by component and expiration date
+        tools.create_index(
+            self._cr, 'pos_bom_reservation_product_expiration_index',
+            self._table, ['product_id', 'expiration_date']
+        )
+
+    @api.model
+    def _get_reservation_ttl(self):
+        """Get the lifetime of a hold in seconds"""
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'pos_bom_integration.reservation_ttl', DEFAULT_RESERVATION_TTL
+        ))
+
+    @api.model
+    def _get_active_domain(self, component_ids, location=None):
+        """Domain of the active holds on some components, on a location tree"""
+        domain = [
+            ('product_id', 'in', list(component_ids)),
+            ('expiration_date', '>', fields.Datetime.now()),
+        ]
+        if location:
+            domain.append(('location_id.parent_path', '=like', f'{location.parent_path}%'))
+        return domain
+
+    @api.model
+    def _get_reserved_qty(self, component_ids, location=None, exclude_session=None, exclude_order_uids=None):
+        """Get the quantities held by active reservations in one grouped read
+        Args:
+            component_ids: list of component product IDs
+            location: stock.location record (optional), only count the holds
+            on this location tree
+            exclude_session: pos.session record (optional), ignore its own holds
+            exclude_order_uids: list of order UIDs (optional), ignore their holds
+        Returns dict mapping component product ID to reserved quantity
+        """
+        reserved = dict.fromkeys(component_ids, 0.0)
+        if not component_ids:
+            return reserved
+        
+        domain = self._get_active_domain(component_ids, location)
+        if exclude_session:
+            domain.append(('session_id', '!=', exclude_session.id))
+        if exclude_order_uids:
+            domain.append(('order_uid', 'not in', list(exclude_order_uids)))
+        
+        groups = self.sudo()._read_group(domain, ['product_id'], ['quantity:sum'])
+        for product, quantity in groups:
+            reserved[product.id] = quantity
+        return reserved
+
+    @api.model
+    def _get_session_reserved_qty(self, component_ids, location, sessions):
+        """Get the quantities each session holds for no order in particular
+        Returns dict mapping session ID to a dict mapping component product ID
+        to reserved quantity
+        """
+        reserved = defaultdict(dict)
+        if not component_ids or not sessions:
+            return reserved
+        
+        domain = self._get_active_domain(component_ids, location) + [
+            ('session_id', 'in', sessions.ids),
+            ('order_uid', '=', False),
+        ]
+        groups = self.sudo()._read_group(domain, ['session_id', 'product_id'], ['quantity:sum'])
+        for session, product, quantity in groups:
+            reserved[session.id][product.id] = quantity
+        return reserved
+
+    @api.model
+    def _hold_components(self, session, location, demand, order_uid=False):
+        """Place or refresh the holds of an order, replacing its previous ones
+        Args:
+            session: pos.session record
+            location: stock.location record or None
+            demand: dict mapping component product ID to the quantity to hold
+            order_uid: UID of the POS order the components are held for
+        """
+        expiration_date = fields.Datetime.now() + timedelta(seconds=self._get_reservation_ttl())
+        holds = self.sudo().search([
+            ('session_id', '=', session.id),
+            ('order_uid', '=', order_uid),
+        ])
+        holds_by_product = {hold.product_id.id: hold for hold in holds}
+        
+        vals_list = []
+        for product_id, quantity in demand.items():
+            hold = holds_by_product.pop(product_id, None)
+            if hold:
+                hold.write({
+                    'quantity': quantity,
+                    'location_id': location.id if location else False,
+                    'expiration_date': expiration_date,
+                })
+            else:
+                vals_list.append({
+                    'session_id': session.id,
+                    'order_uid': order_uid,
+                    'product_id': product_id,
+                    'location_id': location.id if location else False,
+                    'quantity': quantity,
+                    'expiration_date': expiration_date,
+                })
+        if vals_list:
+            self.sudo().create(vals_list)
+        # Components the order no longer needs are released
+        self.sudo().browse([hold.id for hold in holds_by_product.values()]).unlink()
+
+    @api.model
+    def _release_order_holds(self, order_uids):
+        """Release the holds of the given orders"""
+        if order_uids:
+            self.sudo().search([('order_uid', 'in', list(order_uids))]).unlink()
+
+    @api.autovacuum
+    def _gc_expired_reservations(self):
+        """Remove holds that are past their expiration date"""
+        self.sudo().search([('expiration_date', '<=', fields.Datetime.now())]).unlink()
@@ -0,0 +1,134 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+DEFAULT_NOTIFICATION_THROTTLE = 10  # seconds
+
+
+class PosBomStockDelta(models.Model):
+    _name = 'pos.bom.stock.delta'
+    _description = 'POS BOM Component Stock Change'
+    _order = 'id'
+
+    location_id = fields.Many2one(
+        'stock.location',
+        string='Location',
+        required=True,
+        ondelete='cascade'
+    )
+    
+    product_id = fields.Many2one(
+        'product.product',
+        string='Component',
+        required=True,
+        ondelete='cascade'
+    )
+    
+    quantity = fields.Float(
+        string='Quantity',
+        digits='Product Unit of Measure',
+        help='Change of the quantity available to POS sessions'
+    )
+    
+    session_id = fields.Many2one(
+        'pos.session',
+        string='Origin Session',
+        ondelete='set null',
+        help='POS session whose order caused the change, it already applied it locally'
+    )
+
+    @api.model
+    def _get_notification_throttle(self):
+        """Get the minimum delay in seconds between two notifications"""
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'pos_bom_integration.stock_notification_throttle', DEFAULT_NOTIFICATION_THROTTLE
+        ))
+
+    @api.model
+    def _record(self, vals_list):
+        """Record component stock changes to notify open POS sessions
+        The first change of a location waiting in the queue schedules its
+        notification, later ones of that location are sent with it.
+        """
+        if not vals_list:
+            return self.browse()
+        session_id = self.env.context.get('pos_bom_origin_session_id')
+        for vals in vals_list:
+            vals.setdefault('session_id', session_id)
+        
+        Delta = self.sudo()
+        location_ids = {vals['location_id'] for vals in vals_list}
+        waiting = Delta.search([('location_id', 'in', list(location_ids))]).location_id
+        deltas = Delta.create(vals_list)
+        if location_ids - set(waiting.ids):
+            self._schedule_notification(self.env.cr.now())
+        return deltas
+
+    @api.model
+    def _schedule_notification(self, since):
+        """Run the notification cron once the throttle delay after since is over"""
+        self.env.ref('pos_bom_integration.ir_cron_notify_pos_bom_stock')._trigger(
+            since + timedelta(seconds=self._get_notification_throttle())
+        )
+
+    @api.model
+    def _get_session_channel(self, config):
+        """Bus channel of the open sessions of a POS config
+        Built from the config's access token, which only its sessions load, so
+        other bus clients cannot guess it and follow the stock movements.
+        """
+        return f'pos_bom_stock_{config.access_token}'
+
+    @api.model
+    def _cron_notify_stock_deltas(self):
+        """Send the recorded stock changes to the open POS sessions
+        Changes are sent per location once the throttle delay after the first
+        waiting change of the location is over, other locations wait for their
+        own delay. Changes are summed per component and origin session, and
+        every POS config receives one message with the changes under its stock
+        location.
+        """
+        cutoff = self.env.cr.now() - timedelta(seconds=self._get_notification_throttle())
+        due_location_ids = []
+        waiting_since = []
+        for location, first_date in self._read_group([], ['location_id'], ['create_date:min']):
+            # Cron triggers are stored to the second
+            first_date = first_date.replace(microsecond=0)
+            if first_date <= cutoff:
+                due_location_ids.append(location.id)
+            else:
+                waiting_since.append(first_date)
+        if waiting_since:
+            self._schedule_notification(min(waiting_since))
+        deltas = self.search([('location_id', 'in', due_location_ids)])
+        if not deltas:
+            return
+        
+        groups = self._read_group(
+            [('id', 'in', deltas.ids)],
+            ['location_id', 'product_id', 'session_id'],
+            ['quantity:sum'],
+        )
+        configs = self.env['pos.session'].search([('state', '=', 'opened')]).config_id
+        
+        notifications = []
+        for config in configs:
+            location = config._get_bom_stock_location()
+            if not location:
+                continue
+            quantities = defaultdict(float)
+            for delta_location, product, session, quantity in groups:
+                if delta_location.parent_path.startswith(location.parent_path):
+                    quantities[product.id, session.id] += quantity
+            payload = [
+                [product_id, quantity, session_id]
+                for (product_id, session_id), quantity in quantities.items() if quantity
+            ]
+            if payload:
+                notifications.append([
+                    self._get_session_channel(config), 'pos_bom_stock_delta', {'deltas': payload}
+                ])
+        
+        self.env['bus.bus']._sendmany(notifications)
+        deltas.unlink()
@@ -1,15 +1,99 @@
+import logging
+from collections import defaultdict
+
 from odoo import models, fields, api
-from odoo.exceptions import ValidationError
+from odoo.exceptions import UserError
+
+from .bom_metrics import bom_timer
+
+_logger = logging.getLogger(__name__)
 
 
 class PosOrder(models.Model):
     _inherit = 'pos.order'
 
+    bom_stock_state = fields.Selection([
+        ('none', 'No BOM'),
+        ('pending', 'Pending'),
+        ('done', 'Posted'),
+        ('failed', 'Failed'),
+    ], string='BOM Stock Status', default='none', readonly=True, copy=False, index=True,
+        help='Whether the BOM component consumption of this order has been posted to inventory')
+    
+    bom_consumption_ids = fields.One2many(
+        'pos.bom.consumption',
+        'order_id',
+        string='BOM Consumption'
+    )
+    
+    bom_degraded_validation = fields.Boolean(
+        string='Validated Offline',
+        readonly=True,
+        copy=False,
+        help='The POS could not reach the server when this order was paid and '
+             'validated its BOM stock against its local stock ledger'
+    )
+    
+    bom_reconciliation_state = fields.Selection([
+        ('pending', 'To Reconcile'),
+        ('done', 'Reconciled'),
+        ('conflict', 'Stock Conflict'),
+    ], string='BOM Reconciliation', readonly=True, copy=False, index=True,
+        help='Outcome of the server check of an order validated offline, or '
+             'stock conflict found when its consumption was posted at session closing')
+
+    def _get_bom_lines(self):
+        """Get the order lines selling a BOM product"""
+        return self.lines.filtered(lambda l: l.product_id.use_bom_in_pos and l.product_id.has_bom)
+
     def _process_bom_inventory_moves(self):
-        """Process BOM inventory moves for all order lines"""
-        for line in self.lines:
-            if line.product_id.use_bom_in_pos and line.product_id.has_bom:
-                line._create_bom_inventory_moves()
+        """Process BOM inventory moves for all order lines
+        Moves of every order in self are created and processed together. Orders
+        of POS configs deducting BOM stock in the background or at session
+        closing only record their consumption.
+        """
+        queued_orders = self.filtered(
+            lambda o: o.session_id.config_id.bom_stock_deduction in ('queued', 'session')
+        )
+        queued_orders._queue_bom_consumption()
+        
+        immediate_orders = self - queued_orders
+        moves = immediate_orders.lines._create_bom_inventory_moves()
+        immediate_orders._get_bom_lines().order_id.bom_stock_state = 'done'
+        return moves
+
+    def _queue_bom_consumption(self):
+        """Record the BOM consumption of the orders for deferred posting"""
+        company_targets = {}
+        vals_list = []
+        orders = self.filtered(lambda o: not o.bom_consumption_ids)
+        for order in orders:
+            move_vals_list = order.lines._prepare_bom_moves_vals_list(company_targets)
+            vals_list += [
+                self.env['pos.bom.consumption']._prepare_from_move_vals(order, move_vals)
+                for move_vals in move_vals_list
+            ]
+        self.env['pos.bom.consumption'].create(vals_list)._record_stock_deltas(-1)
+        orders._update_bom_stock_state()
+
+    def _update_bom_stock_state(self):
+        """Derive the BOM stock status of the orders from their consumption"""
+        for order in self:
+            states = set(order.bom_consumption_ids.mapped('state'))
+            if 'failed' in states:
+                order.bom_stock_state = 'failed'
+            elif 'pending' in states:
+                order.bom_stock_state = 'pending'
+            elif states:
+                order.bom_stock_state = 'done'
+
+    def action_retry_bom_consumption(self):
+        """Queue failed BOM consumption for another posting attempt"""
+        self.bom_consumption_ids.filtered(lambda c: c.state == 'failed').write({
+            'state': 'pending',
+            'attempts': 0,
+        })
+        self._update_bom_stock_state()
 
     def _create_order_picking(self):
         """Override to process BOM inventory moves"""
@@ -19,73 +103,353 @@ class PosOrder(models.Model):
     
     @api.model
     def create_from_ui(self, orders, draft=False):
-        """Override to validate BOM stock before creating orders"""
+        """Override to validate BOM stock and isolate the orders that fail
+        Orders breaching BOM stock or failing to sync are parked for review
+        and returned to the POS with their reasons, the other orders are
+        created together. Orders validated offline are checked as well, a
+        breach flags them with a stock conflict. Draft orders, such as open
+        restaurant tables, consume no stock and are synced unchecked.
+        """
+        if draft:
+            return super().create_from_ui(orders, draft)
+        
         # Validate BOM stock for all orders before creation
-        for order_data in orders:
-            if 'data' in order_data:
-                self._validate_order_bom_stock_from_ui(order_data['data'])
+        ui_orders = [order for order in orders if 'data' in order]
+        config_id = self._get_bom_config_id_from_ui(orders)
+        with bom_timer(self.env, 'create_from_ui_validation', config_id) as sample:
+            check = self._check_orders_bom_stock_from_ui([order['data'] for order in ui_orders])
+            sample['components'] = check['component_count']
+        
+        ParkedOrder = self.env['pos.bom.parked.order']
+        failures = [
+            ParkedOrder._park(
+                ui_orders[breach['index']],
+                f"Order validation failed: {breach['errors'][0]['error']}",
+                breach['errors'],
+            )
+            for breach in check['breaches']
+        ]
+        breach_indexes = {breach['index'] for breach in check['breaches']}
+        valid_orders = [order for order in orders if 'data' not in order] + [
+            order for index, order in enumerate(ui_orders) if index not in breach_indexes
+        ]
         
-        return super().create_from_ui(orders, draft)
+        sessions = self.env['pos.session'].browse({
+            order['data'].get('pos_session_id') for order in ui_orders
+        } - {None, False})
+        
+        # The syncing session already applied its stock changes to its ledger
+        origin = self.with_context(pos_bom_origin_session_id=sessions.id) if len(sessions) == 1 else self
+        res = []
+        if valid_orders:
+            # Create the orders together, or one by one under their own
+            # savepoint when that fails so a bad order cannot block the others
+            try:
+                with self.env.cr.savepoint():
+                    res = super(PosOrder, origin).create_from_ui(valid_orders, draft)
+            except UserError:
+                for order in valid_orders:
+                    try:
+                        with self.env.cr.savepoint():
+                            res += super(PosOrder, origin).create_from_ui([order], draft)
+                    except UserError as e:
+                        if 'data' not in order:
+                            raise
+                        _logger.warning("Could not sync POS order %s: %s", order['data'].get('name'), e)
+                        failures.append(ParkedOrder._park(order, str(e)))
+        
+        # Orders validated offline are created, their breaches are reported
+        conflict_references = {conflict['name'] for conflict in check['conflicts']}
+        if conflict_references:
+            conflict_orders = self.browse([
+                order['id'] for order in res if order.get('pos_reference') in conflict_references
+            ])
+            _logger.warning(
+                "POS orders validated offline exceed the BOM stock: %s",
+                ', '.join(conflict_orders.mapped('pos_reference'))
+            )
+            conflict_orders.bom_reconciliation_state = 'conflict'
+        
+        # Orders parked by an earlier sync are synced now
+        uids = {order['data'].get('name'): order['data'].get('uid') for order in ui_orders}
+        ParkedOrder._mark_synced({
+            uids[order['pos_reference']]: order['id']
+            for order in res if uids.get(order.get('pos_reference'))
+        })
+        
+        # Synced orders now consume the stock they were holding
+        failed_references = {failure['pos_reference'] for failure in failures}
+        self.env['pos.bom.reservation']._release_order_holds([
+            order['data']['uid'] for order in ui_orders
+            if order['data'].get('uid') and order['data'].get('name') not in failed_references
+        ])
+        return res + failures
     
     @api.model
-    def _validate_order_bom_stock_from_ui(self, order_data):
-        """Validate BOM stock from UI order data"""
-        if 'lines' not in order_data:
-            return
-        
-        for line_data in order_data['lines']:
-            if len(line_data) >= 3:  # [0, 0, line_dict]
-                line_dict = line_data[2]
-                if 'product_id' in line_dict and 'qty' in line_dict:
-                    product = self.env['product.product'].browse(line_dict['product_id'])
-                    if product.use_bom_in_pos and product.has_bom:
-                        validation = product.product_tmpl_id.validate_bom_stock(line_dict['qty'])
-                        if not validation['valid']:
-                            raise ValidationError(
-                                f"Order validation failed: {validation['error']}"
-                            )
+    def _get_bom_config_id_from_ui(self, orders):
+        """Get the POS config ID of a batch of UI orders, for instrumentation"""
+        session_id = next((
+            order_data['data'].get('pos_session_id')
+            for order_data in orders if 'data' in order_data
+        ), None)
+        return self.env['pos.session'].browse(session_id).config_id.id if session_id else None
+
+    @api.model
+    def _check_orders_bom_stock_from_ui(self, orders_data):
+        """Check the BOM stock of a batch of UI orders in one pass
+        Orders are checked in sequence against one running ledger of component
+        stock per stock location, so each order only gets the stock the orders
+        before it left, whatever their session. An order breaching stock
+        consumes none. Orders the POS validated offline were sold already:
+        they always consume their stock and a breach is reported as a conflict.
+        Args:
+            orders_data: list of UI order data dicts
+        Returns:
+            dict: {'breaches': list of dicts with 'index', 'uid', 'name' and
+            'errors' (as in validate_bom_stock_batch) for every order that
+            would breach stock, 'conflicts': the same for the orders validated
+            offline, 'component_count': number of distinct components checked}
+        """
+        checked = []
+        for order_index, order_data in enumerate(orders_data):
+            if 'lines' not in order_data:
+                continue
+            session = self.env['pos.session'].browse(order_data.get('pos_session_id'))
+            if session.config_id and not session.config_id.enable_bom_validation:
+                continue
+            line_dicts = [
+                line_data[2] for line_data in order_data['lines']
+                if len(line_data) >= 3 and 'product_id' in line_data[2] and 'qty' in line_data[2]
+            ]
+            checked.append((order_index, order_data, session, line_dicts))
+        
+        # Explode every order with one product read and one component index read
+        products = self.env['product.product'].browse({
+            line_dict['product_id'] for *_, line_dicts in checked for line_dict in line_dicts
+        })
+        templates = {product.id: product.product_tmpl_id for product in products}
+        ProductTemplate = self.env['product.template']
+        demands = ProductTemplate._explode_bom_demands([
+            [(templates[line_dict['product_id']], line_dict['qty']) for line_dict in line_dicts]
+            for *_, line_dicts in checked
+        ])
+        
+        entries = []
+        components_by_location = defaultdict(set)
+        sessions_by_location = defaultdict(lambda: self.env['pos.session'])
+        for (order_index, order_data, session, line_dicts), demand in zip(checked, demands):
+            location = session.config_id._get_bom_stock_location() if session.config_id else None
+            components_by_location[location].update(demand)
+            sessions_by_location[location] |= session
+            entries.append((order_index, order_data, session, location, demand))
+        
+        # Every ledger starts from the stock of its location, less the unposted
+        # consumption and the holds of the orders outside this batch. Holds a
+        # session placed for no order in particular stay available to its orders.
+        order_uids = [order_data['uid'] for order_index, order_data, session, line_dicts in checked if order_data.get('uid')]
+        Reservation = self.env['pos.bom.reservation']
+        ledgers = {}
+        session_holds = {}
+        for location, component_ids in components_by_location.items():
+            component_ids = list(component_ids)
+            available = ProductTemplate._get_bom_components_available_qty(component_ids, location)
+            unposted = self.env['pos.bom.consumption']._get_pending_qty(component_ids, location)
+            reserved = Reservation._get_reserved_qty(component_ids, location, exclude_order_uids=order_uids)
+            ledgers[location] = {
+                component_id: available[component_id] - unposted[component_id] - reserved[component_id]
+                for component_id in component_ids
+            }
+            session_holds[location] = Reservation._get_session_reserved_qty(
+                component_ids, location, sessions_by_location[location]
+            )
+        
+        breaches = []
+        conflicts = []
+        for order_index, order_data, session, location, demand in entries:
+            ledger = ledgers[location]
+            own_holds = session_holds[location][session.id]
+            errors = ProductTemplate._get_bom_stock_errors(demand, {
+                component_id: ledger[component_id] + own_holds.get(component_id, 0.0)
+                for component_id in demand
+            })
+            offline = order_data.get('bom_degraded_validation')
+            if errors:
+                (conflicts if offline else breaches).append({
+                    'index': order_index,
+                    'uid': order_data.get('uid'),
+                    'name': order_data.get('name'),
+                    'errors': errors,
+                })
+                if not offline:
+                    continue
+            for component_id, entry in demand.items():
+                held_qty = min(own_holds.get(component_id, 0.0), entry['required'])
+                own_holds[component_id] = own_holds.get(component_id, 0.0) - held_qty
+                ledger[component_id] -= entry['required'] - held_qty
+        
+        return {
+            'breaches': breaches,
+            'conflicts': conflicts,
+            'component_count': len(set().union(*demands)),
+        }
 
     @api.model
-    def validate_bom_stock_rpc(self, product_id, quantity, pos_config_id=None):
+    def validate_bom_stock_rpc(self, product_id, quantity, pos_config_id=None, order_uid=None):
         """RPC method to validate BOM stock from frontend
         Args:
             product_id: ID of the product to validate
             quantity: Quantity being ordered
             pos_config_id: ID of the POS config (optional)
+            order_uid: UID of the POS order the product is added to (optional)
         Returns:
             dict: {'valid': bool, 'error': str, 'details': dict}
         """
-        try:
-            product = self.env['product.product'].browse(product_id)
-            if not product.exists():
-                return {'valid': False, 'error': 'Product not found'}
-            
-            pos_config = None
-            if pos_config_id:
-                pos_config = self.env['pos.config'].browse(pos_config_id)
-            
-            validation = product.product_tmpl_id.validate_bom_stock(quantity, pos_config)
-            return validation
-        except Exception as e:
-            return {'valid': False, 'error': str(e)}
+        with bom_timer(self.env, 'validate_bom_stock_rpc', pos_config_id) as sample:
+            try:
+                product = self.env['product.product'].browse(product_id)
+                if not product.exists():
+                    return {'valid': False, 'error': 'Product not found'}
+                
+                pos_config = None
+                session = None
+                if pos_config_id:
+                    pos_config = self.env['pos.config'].browse(pos_config_id)
+                    session = pos_config.current_session_id or None
+                
+                validation = product.product_tmpl_id.validate_bom_stock(
+                    quantity, pos_config, session, hold=True, order_uid=order_uid
+                )
+                sample['components'] = validation.pop('component_count', 0)
+                return validation
+            except Exception as e:
+                return {'valid': False, 'error': str(e)}
+    
+    @api.model
+    def validate_bom_stock_lines(self, lines, pos_config_id=None, order_uid=None):
+        """RPC method to validate BOM stock of a whole order from frontend
+        Args:
+            lines: list of {'product_id': int, 'qty': float} dicts
+            pos_config_id: ID of the POS config (optional)
+            order_uid: UID of the POS order (optional), its components are held
+        Returns:
+            dict: {'valid': bool, 'errors': list of per-line error dicts with
+            'index', 'product_id', 'product_name', 'quantity' and 'error'}
+        """
+        with bom_timer(self.env, 'validate_bom_stock_lines', pos_config_id) as sample:
+            try:
+                products = self.env['product.product'].browse([line['product_id'] for line in lines])
+                pos_config = None
+                session = None
+                if pos_config_id:
+                    pos_config = self.env['pos.config'].browse(pos_config_id)
+                    session = pos_config.current_session_id or None
+                
+                validation = self.env['product.template'].validate_bom_stock_batch(
+                    [(product.product_tmpl_id, line['qty']) for product, line in zip(products, lines)],
+                    pos_config, session, hold=True, order_uid=order_uid
+                )
+                sample['components'] = validation['component_count']
+            except Exception as e:
+                return {'valid': False, 'errors': [{'index': False, 'error': str(e)}]}
+        
+        errors = []
+        for error in validation['errors']:
+            for index in error['lines']:
+                errors.append({
+                    'index': index,
+                    'product_id': products[index].id,
+                    'product_name': products[index].display_name,
+                    'quantity': lines[index]['qty'],
+                    'error': error['error'],
+                })
+        
+        return {
+            'valid': len(errors) == 0,
+            'errors': errors
+        }
+    
+    @api.model
+    def reconcile_bom_degraded_orders(self, pos_references, pos_config_id=None):
+        """Check the orders validated offline against the server stock in one pass
+        Args:
+            pos_references: references of the orders the POS validated offline
+            pos_config_id: ID of the POS config (optional)
+        Returns:
+            dict: {'conflicts': list of dicts with 'component_id',
+            'component_name', 'available' and 'orders' for every component
+            whose stock went negative, 'pending': references not synced yet}
+        """
+        orders = self.search([
+            ('pos_reference', 'in', pos_references),
+            ('bom_degraded_validation', '=', True),
+        ])
+        location = self.env['pos.config'].browse(pos_config_id)._get_bom_stock_location() if pos_config_id else None
+        
+        lines = orders.lines
+        ProductTemplate = self.env['product.template']
+        demand = ProductTemplate._explode_bom_demand(
+            [(line.product_id.product_tmpl_id, line.qty) for line in lines]
+        )
+        component_ids = list(demand)
+        available = ProductTemplate._get_bom_components_available_qty(component_ids, location)
+        # Consumption recorded but not posted yet has not left the stock
+        unposted = self.env['pos.bom.consumption']._get_pending_qty(component_ids, location)
+        
+        conflicts = []
+        conflict_orders = self.browse()
+        for component_id, entry in demand.items():
+            available_qty = available[component_id] - unposted[component_id]
+            if available_qty >= 0:
+                continue
+            component_orders = lines.browse([lines[index].id for index in entry['lines']]).order_id
+            conflict_orders |= component_orders
+            conflicts.append({
+                'component_id': component_id,
+                'component_name': self.env['product.product'].browse(component_id).name,
+                'available': available_qty,
+                'orders': component_orders.mapped('pos_reference'),
+            })
+        
+        conflict_orders.bom_reconciliation_state = 'conflict'
+        # Conflicts found when the orders synced stay reported
+        (orders - conflict_orders).filtered(
+            lambda o: o.bom_reconciliation_state == 'pending'
+        ).bom_reconciliation_state = 'done'
+        
+        # Parked orders wait for a review, not for a sync
+        parked_references = self.env['pos.bom.parked.order'].search([
+            ('name', 'in', pos_references),
+            ('state', '=', 'parked'),
+        ]).mapped('name')
+        synced_references = set(orders.mapped('pos_reference')) | set(parked_references)
+        return {
+            'conflicts': conflicts,
+            'pending': [reference for reference in pos_references if reference not in synced_references],
+        }
     
     def validate_order_bom_stock(self):
         """Validate BOM stock for all order lines
+        Component demand is aggregated over every line of the orders in self,
+        per POS config stock location.
         Returns dict with validation results
         """
-        self.ensure_one()
         errors = []
-        
-        for line in self.lines:
-            if line.product_id.use_bom_in_pos and line.product_id.has_bom:
-                validation = line.product_id.product_tmpl_id.validate_bom_stock(line.qty)
-                if not validation['valid']:
+        for config in self.session_id.config_id:
+            lines = self.lines.filtered(lambda l: l.order_id.session_id.config_id == config)
+            validation = self.env['product.template'].validate_bom_stock_batch(
+                [(line.product_id.product_tmpl_id, line.qty) for line in lines],
+                config
+            )
+            
+            for error in validation['errors']:
+                for index in error['lines']:
+                    line = lines[index]
                     errors.append({
                         'line_id': line.id,
                         'product_name': line.product_id.name,
                         'quantity': line.qty,
-                        'error': validation['error'],
-                        'details': validation
+                        'error': error['error'],
+                        'details': error,
                     })
         
         return {
@@ -95,18 +459,28 @@ class PosOrder(models.Model):
     
     @api.model
     def _order_fields(self, ui_order):
-        """Add BOM information to order fields"""
+        """Add BOM information to order fields
+        Lines only carry the ID of the BOM they were sold with, components are
+        resolved from the component index when stock moves are created, or
+        from that BOM when it is no longer the indexed one.
+        """
         res = super()._order_fields(ui_order)
         
-        # Process BOM lines if any
-        if 'lines' in ui_order:
-            for line_data in ui_order['lines']:
-                if len(line_data) >= 3:  # [0, 0, line_dict]
-                    line_dict = line_data[2]
-                    if 'product_id' in line_dict:
-                        product = self.env['product.product'].browse(line_dict['product_id'])
-                        if product.use_bom_in_pos and product.has_bom:
-                            line_dict['has_bom'] = True
-                            line_dict['bom_components'] = product.product_tmpl_id.get_bom_components()
+        if ui_order.get('bom_degraded_validation'):
+            res['bom_degraded_validation'] = True
+            res['bom_reconciliation_state'] = 'pending'
+        
+        # Drop references to BOMs deleted since the POS loaded them
+        line_dicts = [
+            line_data[2] for line_data in res.get('lines') or []
+            if len(line_data) >= 3 and line_data[2].get('bom_id')  # [0, 0, line_dict]
+        ]
+        if line_dicts:
+            existing_bom_ids = set(self.env['mrp.bom'].browse(
+                {line_dict['bom_id'] for line_dict in line_dicts}
+            ).exists().ids)
+            for line_dict in line_dicts:
+                if line_dict['bom_id'] not in existing_bom_ids:
+                    line_dict['bom_id'] = False
         
         return res
@@ -1,9 +1,21 @@
+from collections import defaultdict
+
 from odoo import models, fields, api
 from odoo.exceptions import ValidationError
 
+from .bom_metrics import bom_timer
+
 
 class PosOrderLine(models.Model):
     _inherit = 'pos.order.line'
+
+    bom_id = fields.Many2one(
+        'mrp.bom',
+        string='Bill of Materials',
+        readonly=True,
+        ondelete='set null',
+        help='Bill of materials the POS sold this line with'
+    )
     #
     # def _get_stock_moves_to_consider(self):
     #     """Override to prevent stock moves for BOM parent products.
@@ -25,98 +37,227 @@ class PosOrderLine(models.Model):
     #     # For regular products, use the standard stock move logic
     #     return super()._get_stock_moves_to_consider()
 
-    def _create_bom_inventory_moves(self):
-        """Create inventory moves for BOM components"""
+    def _prepare_bom_move_vals(self, location_src, location_dest, picking_type_id, bom_components=None):
+        """Prepare stock move values for the BOM components of this line
+        Args:
+            bom_components: list of BOM component dicts of the line's product
+            (optional), read from the component index when not given
+        """
         self.ensure_one()
         
         if not (self.product_id.use_bom_in_pos and self.product_id.has_bom):
-            return
+            return []
         
         # Get BOM components
-        bom_components = self.product_id.product_tmpl_id.get_bom_components()
+        if bom_components is None:
+            bom_components = self.product_id.product_tmpl_id.get_bom_components()
         if not bom_components:
-            return
+            return []
         
-        # Get the location for inventory moves
-        location_src = self.order_id.session_id.config_id.picking_type_id.default_location_src_id
-        location_dest = self.env['stock.location'].search([
-            ('usage', '=', 'production'),
-            ('company_id', '=', self.order_id.company_id.id)
-        ], limit=1)
-        
-        if not location_dest:
-            # Create a virtual production location if none exists
-            location_dest = self.env['stock.location'].create({
-                'name': 'POS BOM Production',
-                'usage': 'production',
-                'company_id': self.order_id.company_id.id,
-                'location_id': self.env.ref('stock.stock_location_locations').id,
-            })
-        
-        # Create stock moves for each BOM component
+        move_vals_list = []
         for component in bom_components:
-            component_product = self.env['product.product'].browse(component['product_id'])
-            
-            # Calculate the quantity needed based on order line qty
-            component_qty = component['quantity'] * self.qty
-            
-            # Check if there's enough stock
-            available_qty = component_product.with_context(
-                location=location_src.id
-            ).qty_available
-            
-            if available_qty < component_qty:
-                raise ValidationError(
-                    f"Not enough stock for component '{component['product_name']}'. "
-                    f"Available: {available_qty}, Required: {component_qty}"
-                )
-            
-            # Create stock move
-            move_vals = {
+            move_vals_list.append({
                 'name': f"POS BOM: {self.product_id.name} - {component['product_name']}",
                 'product_id': component['product_id'],
                 'product_uom': component['uom_id'],
-                'product_uom_qty': component_qty,
+                # Calculate the quantity needed based on order line qty
+                'product_uom_qty': component['quantity'] * self.qty,
                 'location_id': location_src.id,
                 'location_dest_id': location_dest.id,
                 'company_id': self.order_id.company_id.id,
                 'state': 'draft',
                 'origin': self.order_id.name,
                 'date': fields.Datetime.now(),
-                'picking_type_id': self._get_picking_type_id(),
-            }
-            
-            move = self.env['stock.move'].create(move_vals)
-            move._action_confirm()
-            move._action_assign()
-            move._action_done()
-            
-            # Force picking validation if the move has a picking and it's not done
-            if move.picking_id and move.picking_id.state != 'done':
-                try:
-                    move.picking_id.button_validate()
-                except Exception as e:
-                    # Log the error but don't break the POS flow
-                    self.env['ir.logging'].create({
-                        'name': 'POS BOM Integration',
-                        'type': 'server',
-                        'level': 'WARNING',
-                        'message': f'Could not auto-validate picking {move.picking_id.name}: {str(e)}',
-                        'func': '_create_bom_inventory_moves',
-                        'line': '1',
-                    })
+                'picking_type_id': picking_type_id,
+            })
+        return move_vals_list
+
+    @api.model
+    def _check_bom_moves_stock(self, move_vals_list):
+        """Check component stock for all BOM moves to create at once
+        Required quantities are summed per source location and component.
+        Consumption recorded but not posted yet is not available.
+        """
+        required = defaultdict(float)
+        for move_vals in move_vals_list:
+            required[move_vals['location_id'], move_vals['product_id']] += move_vals['product_uom_qty']
+        
+        products_by_location = defaultdict(set)
+        for location_id, product_id in required:
+            products_by_location[location_id].add(product_id)
+        
+        ProductTemplate = self.env['product.template']
+        for location_id, product_ids in products_by_location.items():
+            location = self.env['stock.location'].browse(location_id)
+            available = ProductTemplate._get_bom_components_available_qty(list(product_ids), location)
+            unposted = self.env['pos.bom.consumption']._get_pending_qty(list(product_ids), location)
+            for product in self.env['product.product'].browse(product_ids):
+                available_qty = available[product.id] - unposted[product.id]
+                component_qty = required[location_id, product.id]
+                if available_qty < component_qty:
+                    raise ValidationError(
+                        f"Not enough stock for component '{product.name}'. "
+                        f"Available: {available_qty}, Required: {component_qty}"
+                    )
+
+    @api.model
+    def _get_bom_production_location(self, company):
+        """Get or create the production location receiving BOM components"""
+        domain = [
+            ('usage', '=', 'production'),
+            ('company_id', '=', company.id)
+        ]
+        location_dest = self.env['stock.location'].search(domain, limit=1)
+        if location_dest:
+            return location_dest
+        
+        # Serialize concurrent creations on the company row: a transaction that
+        # created the location in the meantime makes this update fail with a
+        # serialization error, and the request is retried and finds it
+        self.env.cr.execute(
+            "UPDATE res_company SET write_date = write_date WHERE id = %s",
+            [company.id]
+        )
+        location_dest = self.env['stock.location'].search(domain, limit=1)
+        if not location_dest:
+            # Create a virtual production location if none exists
+            location_dest = self.env['stock.location'].create({
+                'name': 'POS BOM Production',
+                'usage': 'production',
+                'company_id': company.id,
+                'location_id': self.env.ref('stock.stock_location_locations').id,
+            })
+        return location_dest
+
+    def _prepare_bom_moves_vals_list(self, company_targets=None):
+        """Prepare stock move values for the BOM components of all lines in self
+        Args:
+            company_targets: dict (optional) memoizing the production location
+            and picking type per company ID, to share across calls
+        """
+        # Resolve the production location and picking type once per company
+        company_targets = {} if company_targets is None else company_targets
+        bom_lines = self.filtered(lambda l: l.product_id.use_bom_in_pos and l.product_id.has_bom)
+        # Components of every product are read from the index at once
+        ProductTemplate = self.env['product.template']
+        template_ids = bom_lines.product_id.product_tmpl_id.ids
+        bom_components = ProductTemplate.get_bom_components_batch(template_ids)
+        indexed_bom_ids = self.env['pos.bom.component.index']._get_bom_ids(template_ids)
+        move_vals_list = []
+        for line in bom_lines:
+            template = line.product_id.product_tmpl_id
+            components = bom_components[template.id]
+            # Lines sold with another BOM of the product consume that BOM
+            if (line.bom_id and line.bom_id.id != indexed_bom_ids.get(template.id)
+                    and line.bom_id.product_tmpl_id == template):
+                components = ProductTemplate._get_bom_components_of(template, line.bom_id)
+            company = line.order_id.company_id
+            if company.id not in company_targets:
+                company_targets[company.id] = (
+                    self._get_bom_production_location(company),
+                    self._get_picking_type_id(company),
+                )
+            location_dest, picking_type_id = company_targets[company.id]
+            location_src = line.order_id.session_id.config_id.picking_type_id.default_location_src_id
+            move_vals_list += line._prepare_bom_move_vals(
+                location_src, location_dest, picking_type_id, components
+            )
+        return move_vals_list
+
+    @api.model
+    def _create_bom_stock_moves(self, move_vals_list, checked_vals_list=None):
+        """Check component stock and create the BOM stock moves in one go
+        Args:
+            move_vals_list: list of stock move values to create
+            checked_vals_list: list of stock move values (optional) whose stock
+            is checked, all of move_vals_list by default
+        """
+        if not move_vals_list:
+            return self.env['stock.move']
+        
+        # Check if there's enough stock
+        self._check_bom_moves_stock(move_vals_list if checked_vals_list is None else checked_vals_list)
+        return self.env['stock.move'].create(move_vals_list)
+
+    @api.model
+    def _assign_bom_pickings(self, moves):
+        """Put the BOM moves in one picking per origin
+        Moves are grouped as stock.move._assign_picking groups them, and split
+        by origin so every order keeps its own picking.
+        """
+        groups = defaultdict(lambda: self.env['stock.move'])
+        for move in moves.filtered(lambda m: m.picking_type_id and not m.picking_id):
+            groups[move.origin, move._key_assign_picking()] |= move
+        if not groups:
+            return
+        
+        pickings = self.env['stock.picking'].create([
+            group_moves._get_new_picking_values() for group_moves in groups.values()
+        ])
+        for group_moves, picking in zip(groups.values(), pickings):
+            group_moves.picking_id = picking
+
+    @api.model
+    def _done_bom_stock_moves(self, moves):
+        """Run confirm/assign/done once on the combined BOM stock moves
+        Moves are not merged, every line keeps its own moves. They are posted
+        for their full quantity, the components were sold already: stock that
+        is short by then is reported, it does not block the posting.
+        """
+        if not moves:
+            return moves
+        
+        self._assign_bom_pickings(moves)
+        moves = moves._action_confirm(merge=False)
+        moves._action_assign()
+        for move in moves.filtered(lambda m: m.quantity < m.product_uom_qty):
+            move.quantity = move.product_uom_qty
+        moves._action_done()
+        
+        # Force picking validation if the moves have a picking that is not done
+        for picking in moves.picking_id.filtered(lambda p: p.state != 'done'):
+            try:
+                picking.button_validate()
+            except Exception as e:
+                # Log the error but don't break the POS flow
+                self.env['ir.logging'].create({
+                    'name': 'POS BOM Integration',
+                    'type': 'server',
+                    'level': 'WARNING',
+                    'message': f'Could not auto-validate picking {picking.name}: {str(e)}',
+                    'func': '_create_bom_inventory_moves',
+                    'line': '1',
+                })
+        return moves
+
+    def _create_bom_inventory_moves(self):
+        """Create inventory moves for BOM components
+        The moves of every line in self are created with a single create and
+        processed in one confirm/assign/done pass. Lines of orders validated
+        offline are not checked against the stock again.
+        """
+        config_id = self.order_id.session_id.config_id[:1].id or None
+        with bom_timer(self.env, 'create_bom_inventory_moves', config_id) as sample:
+            company_targets = {}
+            offline_lines = self.filtered(lambda l: l.order_id.bom_degraded_validation)
+            checked_vals_list = (self - offline_lines)._prepare_bom_moves_vals_list(company_targets)
+            move_vals_list = checked_vals_list + offline_lines._prepare_bom_moves_vals_list(company_targets)
+            sample['components'] = len(move_vals_list)
+            moves = self._create_bom_stock_moves(move_vals_list, checked_vals_list)
+            return self._done_bom_stock_moves(moves)
     
-    def _get_picking_type_id(self):
+    def _get_picking_type_id(self, company=None):
         """Get the picking type for BOM moves"""
+        company = company or self.order_id.company_id
         picking_type = self.env['stock.picking.type'].search([
             ('code', '=', 'internal'),
-            ('company_id', '=', self.order_id.company_id.id)
+            ('company_id', '=', company.id)
         ], limit=1)
         
         if not picking_type:
             picking_type = self.env['stock.picking.type'].search([
                 ('code', '=', 'outgoing'),
-                ('company_id', '=', self.order_id.company_id.id)
+                ('company_id', '=', company.id)
             ], limit=1)
         
         return picking_type.id if picking_type else False
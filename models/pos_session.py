@@ -1,5 +1,9 @@
 from odoo import models, fields, api
 import logging
+import time
+
+from . import bom_metrics
+from .bom_metrics import bom_timer
 
 _logger = logging.getLogger(__name__)
 
@@ -9,38 +13,133 @@ class PosSession(models.Model):
 
     def _get_pos_ui_product_product(self, params):
         """Override to include BOM fields in POS product data"""
-        result = super()._get_pos_ui_product_product(params)
-        
-        # Add BOM fields to each product
-        product_ids = [product['id'] for product in result]
-        products = self.env['product.product'].browse(product_ids)
-        
-        # Create a mapping of product ID to BOM data
-        bom_data = {}
-        bom_products_count = 0
-        for product in products:
-            template = product.product_tmpl_id
-            use_bom = template.use_bom_in_pos
-            has_bom = template.has_bom
+        with bom_timer(self.env, 'load_pos_products', self.config_id.id) as sample:
+            start = time.perf_counter()
+            result = super()._get_pos_ui_product_product(params)
+            debug = self.config_id.bom_debug_mode
             
-            bom_data[product.id] = {
-                'use_bom_in_pos': use_bom,
-                'has_bom': has_bom,
+            # Read the BOM fields of every product at once
+            product_ids = [product['id'] for product in result]
+            bom_fields = self.env['product.product'].browse(product_ids).read(
+                ['product_tmpl_id', 'use_bom_in_pos', 'has_bom'], load=False
+            )
+            bom_data = {data['id']: data for data in bom_fields}
+            
+            # Components are not shipped with the product data, the POS keeps them
+            # in its own cache and fetches the ones whose catalog version changed
+            bom_template_ids = {
+                data['product_tmpl_id'] for data in bom_fields
+                if data['use_bom_in_pos'] and data['has_bom']
             }
+            ComponentIndex = self.env['pos.bom.component.index']
+            bom_ids = ComponentIndex._get_bom_ids(list(bom_template_ids))
+            sample['components'] = sum(
+                len(components) for components in ComponentIndex._get_components(list(bom_template_ids)).values()
+            )
             
-            if use_bom and has_bom:
-                bom_products_count += 1
-                _logger.info(f"BOM Product found: {product.name} (ID: {product.id}) - use_bom_in_pos: {use_bom}, has_bom: {has_bom}")
-        
-        # Add BOM data to result
-        for product_data in result:
-            product_id = product_data['id']
-            if product_id in bom_data:
-                product_data.update(bom_data[product_id])
-                
-        _logger.info(f"Loaded {len(result)} products with BOM data, {bom_products_count} BOM products found")
+            # Add BOM data to result
+            bom_products_count = 0
+            for product_data in result:
+                data = bom_data.get(product_data['id'])
+                if not data:
+                    continue
+                product_data['use_bom_in_pos'] = data['use_bom_in_pos']
+                product_data['has_bom'] = data['has_bom']
+                if data['use_bom_in_pos'] and data['has_bom']:
+                    bom_products_count += 1
+                    product_data['bom_id'] = bom_ids.get(data['product_tmpl_id'], False)
+                    if debug:
+                        _logger.info(
+                            "POS BOM product loaded: session=%s product=%s (ID: %s) bom=%s",
+                            self.name, product_data.get('display_name'), product_data['id'],
+                            product_data['bom_id']
+                        )
+            
+            _logger.info(
+                "POS BOM data loaded: session=%s products=%s bom_products=%s duration=%.3fs",
+                self.name, len(result), bom_products_count, time.perf_counter() - start
+            )
         return result
 
+    def _validate_session(self, balancing_account=False, amount_to_balance=0, bank_payment_method_diffs=None):
+        """Override to post the BOM consumption collected during the session"""
+        self._post_bom_consumption_at_closing()
+        return super()._validate_session(balancing_account, amount_to_balance, bank_payment_method_diffs)
+
+    def _post_bom_consumption_at_closing(self):
+        """Post the session's pending BOM consumption as aggregated stock moves
+        Pending consumption is posted whatever the current deduction mode, it
+        may have been recorded before the mode changed.
+        """
+        for session in self:
+            consumptions = self.env['pos.bom.consumption'].search([
+                ('session_id', '=', session.id),
+                ('state', '=', 'pending'),
+            ])
+            if consumptions:
+                consumptions._post_aggregated(session.name)
+
+    def _pos_data_process(self, loaded_data):
+        """Override to ship the BOM catalog version and component stock snapshot"""
+        super()._pos_data_process(loaded_data)
+        template_ids = list({
+            product_data['product_tmpl_id'][0]
+            for product_data in loaded_data.get('product.product', [])
+            if product_data.get('use_bom_in_pos') and product_data.get('has_bom')
+        })
+        ComponentIndex = self.env['pos.bom.component.index']
+        loaded_data['pos_bom_catalog'] = ComponentIndex._get_catalog_versions(template_ids)
+        
+        index = ComponentIndex._get_components(template_ids)
+        component_ids = {
+            component_id for components in index.values() for component_id, *_ in components
+        }
+        loaded_data['pos_bom_stock'] = self._get_pos_bom_stock_snapshot(list(component_ids))
+        bom_components = {
+            template_id: [
+                {'product_id': component_id, 'quantity': quantity}
+                for component_id, quantity, uom_id, level in components
+            ]
+            for template_id, components in index.items()
+        }
+        loaded_data['pos_bom_max_qty'] = self.env['product.template']._get_bom_max_qty(
+            bom_components, loaded_data['pos_bom_stock']
+        )
+
+    def _get_pos_bom_stock_snapshot(self, component_ids):
+        """Get the available quantity of BOM components for the POS stock ledger
+        Returns dict mapping component product ID to available quantity
+        """
+        location = self.config_id._get_bom_stock_location()
+        available = self.env['product.template']._get_bom_components_available_qty(component_ids, location)
+        reserved = self.env['pos.bom.reservation']._get_reserved_qty(component_ids, location, self)
+        # Consumption recorded but not posted yet has not left the stock
+        unposted = self.env['pos.bom.consumption']._get_pending_qty(component_ids, location)
+        return {
+            component_id: quantity - reserved[component_id] - unposted[component_id]
+            for component_id, quantity in available.items()
+        }
+
+    def get_pos_bom_components(self, template_ids):
+        """RPC method loading the BOM data of products the POS loaded after startup
+        Args:
+            template_ids: IDs of the BOM product templates
+        Returns:
+            dict: {'components': template ID -> list of component dicts,
+            'stock': component ID -> available quantity}
+        """
+        self.ensure_one()
+        bom_components = self.env['product.template'].get_bom_components_batch(template_ids)
+        component_ids = {
+            component['product_id']
+            for components in bom_components.values()
+            for component in components
+        }
+        return {
+            'components': bom_components,
+            'stock': self._get_pos_bom_stock_snapshot(list(component_ids)),
+        }
+
 
 class PosConfig(models.Model):
     _inherit = 'pos.config'
@@ -50,3 +149,40 @@ class PosConfig(models.Model):
         default=True,
         help='When enabled, POS will validate BOM component stock before allowing orders'
     )
+    
+    bom_debug_mode = fields.Boolean(
+        string='BOM Debug Logging',
+        default=False,
+        help='When enabled, the server and the POS log the BOM data of every product they load'
+    )
+    
+    bom_stock_deduction = fields.Selection([
+        ('immediate', 'At order sync'),
+        ('queued', 'Queued in background'),
+        ('session', 'Aggregated at session closing'),
+    ], string='BOM Stock Deduction', default='immediate', required=True,
+        help='When queued, syncing an order only records its BOM consumption and '
+             'a scheduled action posts the stock moves in batches. When aggregated, '
+             'the consumption of the whole session is posted at closing as one '
+             'stock move per component and location.')
+
+    def _get_bom_stock_location(self):
+        """Get the location whose stock tree backs BOM component availability"""
+        self.ensure_one()
+        return self.picking_type_id.default_location_src_id
+
+    def get_bom_metrics(self):
+        """Get the BOM operation metrics recorded by this worker for this POS
+        Returns dict mapping operation name to its aggregated timings
+        """
+        self.ensure_one()
+        return bom_metrics.summarize(bom_metrics.get_samples(self.env.cr.dbname, self.id))
+
+    def action_view_bom_metrics(self):
+        """Open the read-only BOM metrics of this POS"""
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/pos_bom_integration/metrics?config_id={self.id}',
+            'target': 'new',
+        }
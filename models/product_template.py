@@ -1,5 +1,5 @@
-from odoo import models, fields, api
-
+from odoo import models, fields, api, tools
+from odoo.exceptions import UserError
 
 class ProductTemplate(models.Model):
     _inherit = 'product.template'
@@ -28,31 +28,273 @@ class ProductTemplate(models.Model):
         for record in self:
             record.has_bom = bool(record.bom_ids)
 
+    def write(self, vals):
+        """Override to reindex products sold with their BOM in POS"""
+        res = super().write(vals)
+        if 'use_bom_in_pos' in vals and self.env['pos.bom.component.index']._rebuild(self):
+            self.env.registry.clear_cache()
+        return res
+
     def get_bom_components(self):
-        """Get BOM components for this product"""
+        """Get BOM components for this product
+        Phantom (kit) sub-BOMs are exploded down to stocked components, with
+        quantities per unit of product in each component's UoM. Components are
+        read from the POS BOM component index, only products sold with their
+        BOM in POS have some.
+        """
         self.ensure_one()
-        if not self.bom_ids:
-            return []
-        
-        # Get the first active BOM
-        bom = self.bom_ids.filtered(lambda b: b.active)[:1]
-        if not bom:
-            return []
+        return self.get_bom_components_batch([self.id])[self.id]
+
+    @api.model
+    def get_bom_components_batch(self, template_ids):
+        """Get BOM components of several templates in one call
+        Returns dict mapping template ID to its list of components
+        """
+        index = self.env['pos.bom.component.index']._get_components(template_ids)
         
-        components = []
-        for line in bom.bom_line_ids:
-            components.append({
-                'product_id': line.product_id.id,
-                'product_name': line.product_id.name,
-                'quantity': line.product_qty,
-                'uom_id': line.product_uom_id.id,
-                'uom_name': line.product_uom_id.name,
-            })
+        # Names of all components are read in one batch
+        products = self.env['product.product'].browse({
+            component_id for components in index.values() for component_id, *_ in components
+        })
+        names = {product.id: (product.name, product.uom_id.name) for product in products}
+        return {
+            template_id: [{
+                'product_id': component_id,
+                'product_name': names[component_id][0],
+                'quantity': quantity,
+                'uom_id': uom_id,
+                'uom_name': names[component_id][1],
+                'level': level,
+            } for component_id, quantity, uom_id, level in components]
+            for template_id, components in index.items()
+        }
+
+    @api.model
+    def get_bom_cache_stats(self):
+        """Return hit and miss counters of the BOM component cache for this worker"""
+        return self.env['pos.bom.component.index']._get_cache_stats()
+
+    @api.model
+    @tools.ormcache()
+    def _get_pos_bom_component_ids(self):
+        """Get the IDs of every component used by a BOM product sold in POS
+        Cached in the registry LRU, cleared whenever the component index changes.
+        """
+        return frozenset(self.env['pos.bom.component.index']._get_component_ids())
+
+    @api.model
+    def _flatten_product_bom(self, template, bom):
+        """Explode a BOM of a product for one unit of the product
+        Returns list of component dicts in explosion order, see _flatten_bom
+        """
+        # Quantity of BOM batches needed for one unit of the product
+        factor = template.uom_id._compute_quantity(1.0, bom.product_uom_id, round=False) / bom.product_qty
+        components = {}
+        self._flatten_bom(bom, factor, components, [template.id], 0)
+        return list(components.values())
+
+    @api.model
+    def _get_bom_components_of(self, template, bom):
+        """Get the components of a given BOM of a product, shaped as get_bom_components
+        Used for lines sold with a BOM that is no longer the indexed one.
+        """
+        components = self._flatten_product_bom(template, bom)
+        products = self.env['product.product'].browse([component['product_id'] for component in components])
+        for component, product in zip(components, products):
+            component.update({'product_name': product.name, 'uom_name': product.uom_id.name})
         return components
+
+    @api.model
+    def _flatten_bom(self, bom, factor, components, path, level):
+        """Explode a BOM recursively through its phantom (kit) children
+        Args:
+            bom: mrp.bom record to explode
+            factor: number of BOM batches to explode
+            components: dict mapping component product ID to its component
+            dict, quantities are summed in the component's own UoM
+            path: list of template IDs being exploded, used to detect cycles
+            level: depth of bom below the sold product
+        """
+        kits = self.env['mrp.bom']._bom_find(bom.bom_line_ids.product_id, bom_type='phantom')
+        for line in bom.bom_line_ids:
+            product = line.product_id
+            line_qty = line.product_qty * factor
+            kit = kits.get(product)
+            if kit:
+                if product.product_tmpl_id.id in path:
+                    raise UserError(
+                        f"Recursion error! A product with a Bill of Material should not have "
+                        f"itself in its BoM or child BoMs: '{product.display_name}'"
+                    )
+                kit_factor = line.product_uom_id._compute_quantity(line_qty, kit.product_uom_id, round=False) / kit.product_qty
+                self._flatten_bom(kit, kit_factor, components, path + [product.product_tmpl_id.id], level + 1)
+                continue
+            
+            quantity = line.product_uom_id._compute_quantity(line_qty, product.uom_id, round=False)
+            if product.id in components:
+                components[product.id]['quantity'] += quantity
+            else:
+                components[product.id] = {
+                    'product_id': product.id,
+                    'quantity': quantity,
+                    'uom_id': product.uom_id.id,
+                    'level': level,
+                }
+
+    @api.model
+    def _get_bom_components_available_qty(self, component_ids, location=None):
+        """Get on-hand quantities for several components in one grouped quant read
+        Args:
+            component_ids: list of component product IDs
+            location: stock.location record (optional), restricts the stock
+            to quants under this location tree
+        Returns dict mapping component product ID to available quantity
+        """
+        available = dict.fromkeys(component_ids, 0.0)
+        if not component_ids:
+            return available
+        
+        domain = [('product_id', 'in', list(component_ids))]
+        if location:
+            domain.append(('location_id.parent_path', '=like', f'{location.parent_path}%'))
+        else:
+            domain += [
+                ('location_id.usage', '=', 'internal'),
+                ('company_id', 'in', self.env.companies.ids),
+            ]
+        
+        groups = self.env['stock.quant']._read_group(domain, ['product_id'], ['quantity:sum'])
+        for product, quantity in groups:
+            available[product.id] = quantity
+        return available
+
+    @api.model
+    def _get_bom_max_qty(self, bom_components, available):
+        """Compute the maximum buildable quantity of several BOM products in one pass
+        Args:
+            bom_components: dict mapping template ID to its list of BOM components
+            available: dict mapping component product ID to available quantity
+        Returns dict mapping template ID to the quantity its scarcest component
+        allows, templates without components are not limited
+        """
+        max_qty = {}
+        for template_id, components in bom_components.items():
+            ratios = [
+                max(available.get(component['product_id'], 0.0), 0.0) / component['quantity']
+                for component in components if component['quantity'] > 0
+            ]
+            if ratios:
+                max_qty[template_id] = min(ratios)
+        return max_qty
+
+    @api.model
+    def _explode_bom_demands(self, lines_list):
+        """Explode several groups of BOM lines with one component index read
+        Args:
+            lines_list: list of lists of (product.template record, quantity) tuples
+        Returns list with the demand of every group, as _explode_bom_demand
+        """
+        index = self.env['pos.bom.component.index']._get_components(
+            list({template.id for lines in lines_list for template, quantity in lines})
+        )
+        demands = []
+        for lines in lines_list:
+            demand = {}
+            for line_index, (template, quantity) in enumerate(lines):
+                if quantity <= 0:
+                    continue
+                for component_id, component_qty, uom_id, level in index[template.id]:
+                    entry = demand.setdefault(component_id, {'required': 0.0, 'lines': []})
+                    entry['required'] += component_qty * quantity
+                    entry['lines'].append(line_index)
+            demands.append(demand)
+        return demands
+
+    @api.model
+    def _explode_bom_demand(self, lines):
+        """Explode BOM lines and sum the demand per component
+        Args:
+            lines: list of (product.template record, quantity) tuples
+        Returns dict mapping component ID to {'required': float, 'lines': [line indexes]}
+        """
+        return self._explode_bom_demands([lines])[0]
+
+    @api.model
+    def _get_bom_stock_errors(self, demand, available):
+        """Compare a component demand with the available stock
+        Args:
+            demand: dict as returned by _explode_bom_demand
+            available: dict mapping component ID to available quantity
+        Returns list of error dicts, as in validate_bom_stock_batch
+        """
+        errors = []
+        for component_id, entry in demand.items():
+            available_qty = available[component_id]
+            required_qty = entry['required']
+            if available_qty < required_qty:
+                component_name = self.env['product.product'].browse(component_id).name
+                errors.append({
+                    'error': f"Not enough stock for BOM component '{component_name}'. Available: {available_qty}, Required: {required_qty}",
+                    'component_id': component_id,
+                    'component_name': component_name,
+                    'available': available_qty,
+                    'required': required_qty,
+                    'lines': entry['lines'],
+                })
+        return errors
+
+    @api.model
+    def validate_bom_stock_batch(self, lines, pos_config=None, session=None, hold=False, order_uid=None):
+        """Validate BOM component stock for several lines at once
+        Component demand is summed across all lines before it is compared with
+        the stock, so lines sharing a component cannot over-consume it together.
+        Quantities held by other orders' reservations and consumption recorded
+        but not posted yet are not available.
+        Args:
+            lines: list of (product.template record, quantity) tuples
+            pos_config: pos.config record (optional), restricts the stock to
+            its source location
+            session: pos.session record (optional), without order_uid all its
+            holds stay available
+            hold: place holds for the order on the components when valid
+            order_uid: UID of the POS order being validated (optional), its
+            own holds stay available
+        Returns:
+            dict: {'valid': bool, 'errors': list of dicts with 'error',
+            'component_id', 'component_name', 'available', 'required', 'lines',
+            'component_count': number of distinct components checked}
+        """
+        if pos_config and hasattr(pos_config, 'enable_bom_validation') and not pos_config.enable_bom_validation:
+            return {'valid': True, 'errors': [], 'component_count': 0}  # Validation disabled
+        
+        location = pos_config._get_bom_stock_location() if pos_config else None
+        demand = self._explode_bom_demand(lines)
+        available = self._get_bom_components_available_qty(list(demand), location)
+        Reservation = self.env['pos.bom.reservation']
+        if order_uid:
+            reserved = Reservation._get_reserved_qty(list(demand), location, exclude_order_uids=[order_uid])
+        else:
+            reserved = Reservation._get_reserved_qty(list(demand), location, session)
+        unposted = self.env['pos.bom.consumption']._get_pending_qty(list(demand), location)
+        
+        errors = self._get_bom_stock_errors(demand, {
+            component_id: available[component_id] - reserved[component_id] - unposted[component_id]
+            for component_id in demand
+        })
+        
+        if hold and session and not errors and demand:
+            Reservation._hold_components(
+                session, location,
+                {component_id: entry['required'] for component_id, entry in demand.items()},
+                order_uid or False
+            )
+        
+        return {'valid': not errors, 'errors': errors, 'component_count': len(demand)}
     
-    def validate_bom_stock(self, quantity=1, pos_config=None):
+    def validate_bom_stock(self, quantity=1, pos_config=None, session=None, hold=False, order_uid=None):
         """Validate BOM component stock availability
-        Returns dict with 'valid' boolean and 'error' message if invalid
+        Returns dict with 'valid' boolean, 'error' message if invalid and
+        'component_count' once the components were checked
         """
         self.ensure_one()
         
@@ -60,28 +302,10 @@ class ProductTemplate(models.Model):
         if not self.use_bom_in_pos or not self.has_bom:
             return {'valid': True}
         
-        # Check if BOM validation is enabled in POS config
-        if pos_config and hasattr(pos_config, 'enable_bom_validation') and not pos_config.enable_bom_validation:
-            return {'valid': True}  # Validation disabled
-        
-        components = self.get_bom_components()
-        if not components:
-            return {'valid': True}
-        
-        # Check stock for each component
-        for component in components:
-            component_product = self.env['product.product'].browse(component['product_id'])
-            required_qty = component['quantity'] * quantity
-            available_qty = component_product.qty_available
-            
-            if available_qty < required_qty:
-                return {
-                    'valid': False,
-                    'error': f"Not enough stock for BOM component '{component['product_name']}'. Available: {available_qty}, Required: {required_qty}",
-                    'component_id': component['product_id'],
-                    'component_name': component['product_name'],
-                    'available': available_qty,
-                    'required': required_qty
-                }
+        validation = self.validate_bom_stock_batch([(self, quantity)], pos_config, session, hold, order_uid)
+        if validation['valid']:
+            return {'valid': True, 'component_count': validation['component_count']}
         
-        return {'valid': True}
+        error = {'valid': False, **validation['errors'][0], 'component_count': validation['component_count']}
+        del error['lines']
+        return error
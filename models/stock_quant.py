@@ -0,0 +1,45 @@
+from odoo import models, api
+from odoo.tools import float_is_zero
+
+
+class StockQuant(models.Model):
+    _inherit = 'stock.quant'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Override to notify POS sessions of new POS BOM component stock"""
+        quants = super().create(vals_list)
+        quants._record_pos_bom_stock_deltas({})
+        return quants
+
+    def write(self, vals):
+        """Override to notify POS sessions of POS BOM component stock changes"""
+        if 'quantity' not in vals:
+            return super().write(vals)
+        previous = {quant.id: quant.quantity for quant in self}
+        res = super().write(vals)
+        self._record_pos_bom_stock_deltas(previous)
+        return res
+
+    def _record_pos_bom_stock_deltas(self, previous):
+        """Record the quantity changes of quants holding POS BOM components
+        Args:
+            previous: dict mapping quant ID to its quantity before the change,
+            missing quants had none
+        """
+        component_ids = self.env['product.template']._get_pos_bom_component_ids()
+        if not component_ids:
+            return
+        
+        vals_list = []
+        for quant in self:
+            if quant.product_id.id not in component_ids or quant.location_id.usage != 'internal':
+                continue
+            delta = quant.quantity - previous.get(quant.id, 0.0)
+            if not float_is_zero(delta, precision_rounding=quant.product_uom_id.rounding):
+                vals_list.append({
+                    'location_id': quant.location_id.id,
+                    'product_id': quant.product_id.id,
+                    'quantity': delta,
+                })
+        self.env['pos.bom.stock.delta']._record(vals_list)
@@ -4,40 +4,445 @@ import { patch } from "@web/core/utils/patch";
 import { PosStore } from "@point_of_sale/app/store/pos_store";
 import { Order } from "@point_of_sale/app/store/models";
 import { Orderline } from "@point_of_sale/app/store/models";
+import { ProductCard } from "@point_of_sale/app/generic_components/product_card/product_card";
+import { usePos } from "@point_of_sale/app/store/pos_hook";
 import { AlertDialog } from "@web/core/confirmation_dialog/confirmation_dialog";
+import { ConnectionLostError } from "@web/core/network/rpc_service";
+
+// Quiet period after the last quantity edit before the server confirms it
+const BOM_CONFIRMATION_DELAY = 800;
+
+// Browser storage of the BOM catalog, survives POS reloads
+const BOM_CACHE_DB = "pos_bom_integration";
+const BOM_CACHE_STORE = "bom_cache";
+
+function openBomCache() {
+    return new Promise((resolve, reject) => {
+        const request = indexedDB.open(BOM_CACHE_DB, 1);
+        request.onupgradeneeded = () => request.result.createObjectStore(BOM_CACHE_STORE);
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+async function loadBomCache(key) {
+    // Any storage failure falls back to a cold start
+    try {
+        const db = await openBomCache();
+        return await new Promise((resolve, reject) => {
+            const request = db.transaction(BOM_CACHE_STORE).objectStore(BOM_CACHE_STORE).get(key);
+            request.onsuccess = () => resolve(request.result || {});
+            request.onerror = () => reject(request.error);
+        });
+    } catch (error) {
+        console.warn('BOM cache unavailable', error);
+        return {};
+    }
+}
+
+async function saveBomCache(key, catalog, products) {
+    const templates = {};
+    for (const product of products) {
+        const templateId = product.product_tmpl_id[0];
+        if (product.bom_components && templateId in catalog.templates) {
+            templates[templateId] = {
+                token: catalog.templates[templateId],
+                components: product.bom_components,
+            };
+        }
+    }
+    try {
+        const db = await openBomCache();
+        db.transaction(BOM_CACHE_STORE, "readwrite").objectStore(BOM_CACHE_STORE).put(
+            { version: catalog.version, templates },
+            key
+        );
+    } catch (error) {
+        console.warn('Failed to store the BOM cache', error);
+    }
+}
 
 // Comprehensive PosStore patch for BOM data loading and validation
 patch(PosStore.prototype, {
     async _processData(loadedData) {
         await super._processData(...arguments);
+        const start = performance.now();
+        
+        // BOM data kept by this browser across reloads, per database, language and POS
+        // config, and versioned by catalog
+        const catalog = loadedData['pos_bom_catalog'] || { version: false, scope: '', templates: {} };
+        const cacheKey = `${catalog.scope}/config_${this.config.id}`;
+        const cache = await loadBomCache(cacheKey);
+        
+        // Component stock snapshot backing the local BOM stock ledger, always loaded fresh:
+        // the POS cannot start without the server, so a stored snapshot would only be stale
+        this.bomStock = loadedData['pos_bom_stock'] || {};
+        // Maximum sellable quantity per BOM template, precomputed by the server
+        this.bomMaxQty = loadedData['pos_bom_max_qty'] || {};
+        // References of the orders validated offline, waiting for a server check
+        this.bomDegradedOrders = this.db.load('bom_degraded_orders', []);
+        // Memoized click-time validations and in-flight BOM flag and component requests
+        this.bomValidations = new Map();
+        this.bomFieldRequests = new Map();
+        this.bomComponentRequests = new Map();
+        this.bumpBomRevision();
         
         // Process BOM data for products - ensure data is available
         if (loadedData['product.product']) {
-            console.log('Processing BOM data for', loadedData['product.product'].length, 'products');
-            
+            // Reuse the cached components of every template whose version is unchanged
+            // and fetch the stale ones with a single batched call
+            const cachedTemplates = cache.templates || {};
+            const missingProducts = [];
             for (const product of loadedData['product.product']) {
-                // Log the product data to debug
-                console.log('Product:', product.display_name || product.name, 
-                           'use_bom_in_pos:', product.use_bom_in_pos, 
-                           'has_bom:', product.has_bom);
-                
                 if (product.use_bom_in_pos && product.has_bom) {
-                    console.log('Loading BOM components for:', product.display_name || product.name);
-                    try {
-                        // Load BOM components for this product
-                        const bomComponents = await this.env.services.orm.call(
-                            'product.template',
-                            'get_bom_components',
-                            [product.product_tmpl_id[0]]
-                        );
-                        product.bom_components = bomComponents;
-                        console.log('Loaded', bomComponents.length, 'BOM components for', product.display_name);
-                    } catch (error) {
-                        console.error('Failed to load BOM components for', product.display_name, error);
+                    const templateId = product.product_tmpl_id[0];
+                    const cached = cachedTemplates[templateId];
+                    if (cached && cached.token === catalog.templates[templateId]) {
+                        this.setBomComponents(product, cached.components);
+                    } else {
+                        missingProducts.push(product);
                     }
                 }
             }
+            
+            let fetched = true;
+            if (missingProducts.length > 0) {
+                this.bomDebug('Loading BOM components for', missingProducts.length, 'products');
+                try {
+                    const templateIds = [...new Set(missingProducts.map((product) => product.product_tmpl_id[0]))];
+                    const bomComponents = await this.env.services.orm.call(
+                        'product.template',
+                        'get_bom_components_batch',
+                        [templateIds]
+                    );
+                    for (const product of missingProducts) {
+                        this.setBomComponents(product, bomComponents[product.product_tmpl_id[0]] || []);
+                    }
+                } catch (error) {
+                    fetched = false;
+                    console.error('Failed to load BOM components', error);
+                }
+            } else {
+                this.bomDebug('BOM catalog', catalog.version, 'loaded from the browser cache');
+            }
+            
+            for (const product of loadedData['product.product']) {
+                if (product.use_bom_in_pos && product.has_bom) {
+                    this.bomDebug('BOM product:', product.display_name || product.name,
+                                  'components:', (product.bom_components || []).length);
+                }
+            }
+            if (fetched && catalog.version && catalog.version !== cache.version) {
+                saveBomCache(cacheKey, catalog, loadedData['product.product']);
+            }
+            
+            this.indexBomComponents(loadedData['product.product']);
+            this.subscribeBomStockDeltas();
+            
+            const bomProductsCount = loadedData['product.product'].filter(
+                (product) => product.use_bom_in_pos && product.has_bom
+            ).length;
+            console.info(
+                `POS BOM data processed: ${loadedData['product.product'].length} products, ` +
+                `${bomProductsCount} BOM products in ${Math.round(performance.now() - start)} ms`
+            );
+        }
+    },
+    
+    setBomComponents(product, components) {
+        // Set on the loaded data and on the product model built from it
+        product.bom_components = components;
+        const model = this.db.get_product_by_id(product.id);
+        if (model) {
+            model.bom_components = components;
+        }
+    },
+    
+    indexBomComponents(products) {
+        // Components per BOM template and BOM templates per component, for incremental refreshes
+        this.bomComponentsByTemplate = {};
+        this.bomTemplatesByComponent = {};
+        for (const product of products) {
+            this.indexBomProduct(product);
+        }
+    },
+    
+    indexBomProduct(product) {
+        if (!(product.use_bom_in_pos && product.has_bom && product.bom_components)) {
+            return;
+        }
+        const templateId = product.product_tmpl_id[0];
+        this.bomComponentsByTemplate[templateId] = product.bom_components;
+        for (const component of product.bom_components) {
+            (this.bomTemplatesByComponent[component.product_id] ||= new Set()).add(templateId);
+        }
+    },
+    
+    getBomTemplatesOfComponents(componentIds) {
+        // BOM templates using any of the given components
+        const templateIds = new Set();
+        for (const componentId of componentIds) {
+            for (const templateId of this.bomTemplatesByComponent[componentId] || []) {
+                templateIds.add(templateId);
+            }
+        }
+        return [...templateIds];
+    },
+    
+    updateBomMaxQty(templateIds) {
+        // Recompute the maximum sellable quantity of some templates from the local ledger
+        for (const templateId of templateIds) {
+            const ratios = (this.bomComponentsByTemplate[templateId] || [])
+                .filter((component) => component.quantity > 0)
+                .map((component) => Math.max(this.bomStock[component.product_id] || 0, 0) / component.quantity);
+            if (ratios.length > 0) {
+                this.bomMaxQty[templateId] = Math.min(...ratios);
+            } else {
+                delete this.bomMaxQty[templateId];
+            }
+        }
+    },
+    
+    getBomMaxQty(product) {
+        // Quantity of a BOM product that can still be sold, net of the open carts.
+        // Returns null when the product is not limited by BOM stock.
+        if (!(product.use_bom_in_pos && product.has_bom)) {
+            return null;
+        }
+        let maxQty = this.bomMaxQty[product.product_tmpl_id[0]];
+        if (maxQty === undefined) {
+            return null;
+        }
+        const pending = this.getBomPendingDemand();
+        for (const component of product.bom_components || []) {
+            const pendingQty = pending[component.product_id];
+            if (pendingQty && component.quantity > 0) {
+                const available = (this.bomStock[component.product_id] || 0) - pendingQty;
+                maxQty = Math.min(maxQty, Math.max(available, 0) / component.quantity);
+            }
+        }
+        return maxQty;
+    },
+    
+    subscribeBomStockDeltas() {
+        // Stock changes of BOM components are pushed by the server, no polling needed
+        // The channel is named after the config's access token, other clients cannot guess it
+        const busService = this.env.services.bus_service;
+        busService.addChannel(`pos_bom_stock_${this.config.access_token}`);
+        busService.subscribe('pos_bom_stock_delta', (payload) => this.applyBomStockDeltas(payload.deltas));
+    },
+    
+    applyBomStockDeltas(deltas) {
+        // Apply [component ID, quantity change, origin session ID] triples to the local ledger,
+        // changes made by this session's own orders are already in it
+        const componentIds = [];
+        for (const [componentId, quantity, sessionId] of deltas) {
+            if (sessionId === this.pos_session.id) {
+                continue;
+            }
+            this.bomStock[componentId] = (this.bomStock[componentId] || 0) + quantity;
+            componentIds.push(componentId);
+        }
+        if (componentIds.length > 0) {
+            this.bomDebug('BOM stock changes received for components:', componentIds);
+            this.updateBomMaxQty(this.getBomTemplatesOfComponents(componentIds));
+            this.bumpBomRevision();
+        }
+    },
+    
+    bomDebug(...args) {
+        // Per-product BOM logging, only when the POS config enables BOM debug logging
+        if (this.config && this.config.bom_debug_mode) {
+            console.log(...args);
+        }
+    },
+    
+    getBomComponentDemand(product, quantity) {
+        // Component quantities consumed by selling `quantity` units of a BOM product
+        const demand = {};
+        if (!(product.use_bom_in_pos && product.has_bom)) {
+            return demand;
+        }
+        for (const component of product.bom_components || []) {
+            demand[component.product_id] = (demand[component.product_id] || 0) + component.quantity * quantity;
+        }
+        return demand;
+    },
+    
+    getBomPendingDemand(excludeOrder) {
+        // Component quantities held by the orders still open in this POS,
+        // cached until the next cart change
+        if (!excludeOrder && this.bomPendingCache) {
+            return this.bomPendingCache;
+        }
+        const demand = {};
+        for (const order of this.get_order_list()) {
+            if (order.bom_committed || order === excludeOrder) {
+                continue;
+            }
+            for (const line of order.get_orderlines()) {
+                const lineDemand = this.getBomComponentDemand(line.product, line.get_quantity());
+                for (const [componentId, qty] of Object.entries(lineDemand)) {
+                    demand[componentId] = (demand[componentId] || 0) + qty;
+                }
+            }
+        }
+        if (!excludeOrder) {
+            this.bomPendingCache = demand;
+        }
+        return demand;
+    },
+    
+    checkBomStockLocally(product, quantity) {
+        // Validate against the local ledger, without any server round trip
+        if (this.config.enable_bom_validation === false || !(product.use_bom_in_pos && product.has_bom)) {
+            return { valid: true };
+        }
+        
+        // Within the precomputed limit no component needs to be looked at
+        const maxQty = this.getBomMaxQty(product);
+        if (maxQty !== null && quantity <= maxQty) {
+            return { valid: true };
+        }
+        
+        const pending = this.getBomPendingDemand();
+        for (const component of product.bom_components || []) {
+            const available = (this.bomStock[component.product_id] || 0) - (pending[component.product_id] || 0);
+            const required = component.quantity * quantity;
+            if (available < required) {
+                return {
+                    valid: false,
+                    error: `Not enough stock for BOM component '${component.product_name}'. Available: ${available}, Required: ${required}`,
+                    component_id: component.product_id,
+                    component_name: component.product_name,
+                    available: available,
+                    required: required,
+                };
+            }
+        }
+        return { valid: true };
+    },
+    
+    checkBomOrderLocally(order) {
+        // Validate a whole order against the local ledger, used while the server is unreachable
+        if (this.config.enable_bom_validation === false) {
+            return [];
+        }
+        
+        const pending = this.getBomPendingDemand(order);
+        const demand = {};
+        const components = {};
+        for (const line of order.get_orderlines()) {
+            const lineDemand = this.getBomComponentDemand(line.product, line.get_quantity());
+            for (const [componentId, qty] of Object.entries(lineDemand)) {
+                demand[componentId] = (demand[componentId] || 0) + qty;
+            }
+            for (const component of line.product.bom_components || []) {
+                components[component.product_id] = component;
+            }
+        }
+        
+        const errors = [];
+        for (const [componentId, required] of Object.entries(demand)) {
+            const available = (this.bomStock[componentId] || 0) - (pending[componentId] || 0);
+            if (available < required) {
+                errors.push({
+                    product_name: components[componentId].product_name,
+                    quantity: required,
+                    error: `Not enough stock for BOM component '${components[componentId].product_name}'. Available: ${available}, Required: ${required}`,
+                });
+            }
+        }
+        return errors;
+    },
+    
+    queueBomReconciliation(order) {
+        // Remember an order validated offline until the server has checked it
+        if (!this.bomDegradedOrders.includes(order.name)) {
+            this.bomDegradedOrders.push(order.name);
+            this.db.save('bom_degraded_orders', this.bomDegradedOrders);
+        }
+    },
+    
+    async reconcileBomDegradedOrders() {
+        // Check every order validated offline with one server call once it is reachable again
+        if (this.bomDegradedOrders.length === 0 || this.bomReconciling) {
+            return;
+        }
+        
+        this.bomReconciling = true;
+        try {
+            const result = await this.env.services.orm.call(
+                'pos.order',
+                'reconcile_bom_degraded_orders',
+                [[...this.bomDegradedOrders], this.config.id]
+            );
+            // Orders the server has not received yet are checked on a later sync
+            this.bomDegradedOrders = result.pending;
+            this.db.save('bom_degraded_orders', this.bomDegradedOrders);
+            
+            if (result.conflicts.length > 0) {
+                const conflictMessages = result.conflicts.map((conflict) =>
+                    `${conflict.component_name}: ${conflict.available} (Orders: ${conflict.orders.join(', ')})`
+                ).join('\n');
+                this.env.services.dialog.add(AlertDialog, {
+                    title: 'BOM Stock Conflicts',
+                    body: `Orders taken offline consumed more stock than available:\n${conflictMessages}`,
+                });
+            }
+        } catch (error) {
+            console.error('BOM reconciliation of offline orders failed:', error);
+        } finally {
+            this.bomReconciling = false;
+        }
+    },
+    
+    commitBomConsumption(order) {
+        // Move the consumption of a paid order from pending into the ledger snapshot
+        if (order.bom_committed) {
+            return;
+        }
+        const componentIds = new Set();
+        for (const line of order.get_orderlines()) {
+            const lineDemand = this.getBomComponentDemand(line.product, line.get_quantity());
+            for (const [componentId, qty] of Object.entries(lineDemand)) {
+                this.bomStock[componentId] = (this.bomStock[componentId] || 0) - qty;
+                componentIds.add(componentId);
+            }
+        }
+        order.bom_committed = true;
+        this.updateBomMaxQty(this.getBomTemplatesOfComponents(componentIds));
+        this.bumpBomRevision();
+    },
+    
+    async push_single_order(order, opts) {
+        if (order) {
+            this.commitBomConsumption(order);
+            if (order.bom_degraded_validation) {
+                this.queueBomReconciliation(order);
+            }
+        }
+        const result = await super.push_single_order(...arguments);
+        this.reconcileBomDegradedOrders();
+        return result;
+    },
+    
+    async _save_to_server(orders, options) {
+        // Orders the server parked for review come back with their reasons
+        const result = await super._save_to_server(...arguments);
+        if (!Array.isArray(result)) {
+            return result;
+        }
+        const failures = result.filter((entry) => entry.bom_failure);
+        if (failures.length > 0) {
+            this.env.services.dialog.add(AlertDialog, {
+                title: 'Orders Parked for Review',
+                body: failures.map((failure) =>
+                    `${failure.pos_reference}: ${failure.bom_failure.reason}`
+                ).join('\n'),
+            });
         }
+        return result.filter((entry) => !entry.bom_failure);
     },
     
     async validateOrderBomStock(order) {
@@ -66,135 +471,231 @@ patch(PosStore.prototype, {
         return { valid: true };
     },
     
-    async addProductToCurrentOrder(product, options = {}) {
-        // Validate BOM stock before adding product to cart (product card click)
-        if (product.use_bom_in_pos && product.has_bom) {
-            console.log('ProductCard click - validating BOM product:', product.display_name);
-            
-            const qty = options.quantity || 1;
-            
-            try {
-                const validation = await this.env.services.orm.call(
-                    'pos.order',
-                    'validate_bom_stock_rpc',
-                    [product.id, qty, this.config.id]
-                );
-                
-                if (!validation.valid) {
-                    this.env.services.dialog.add(AlertDialog, {
-                        title: 'Insufficient Stock',
-                        body: validation.error,
-                    });
-                    return false; // Don't add to cart
-                }
-            } catch (error) {
-                console.error('BOM validation error on product click:', error);
+    bumpBomRevision() {
+        // The cart or the stock snapshot changed: memoized validations are stale
+        this.bomRevision = (this.bomRevision || 0) + 1;
+        this.bomPendingCache = null;
+        if (this.bomValidations) {
+            this.bomValidations.clear();
+        }
+    },
+    
+    checkBomQuantityDelta(product, delta) {
+        // Check only the added quantity of a line against the stock left by the
+        // whole cart, in O(components) once the pending demand is cached
+        if (delta <= 0) {
+            return { valid: true };
+        }
+        return this.checkBomStockLocally(product, delta);
+    },
+    
+    applyBomQuantityDelta(product, delta) {
+        // Keep the cached pending demand in step with a line quantity change
+        // instead of recomputing it from the whole cart
+        if (this.bomPendingCache) {
+            for (const [componentId, qty] of Object.entries(this.getBomComponentDemand(product, delta))) {
+                this.bomPendingCache[componentId] = (this.bomPendingCache[componentId] || 0) + qty;
+            }
+        }
+        this.bomRevision = (this.bomRevision || 0) + 1;
+        if (this.bomValidations) {
+            this.bomValidations.clear();
+        }
+    },
+    
+    scheduleBomConfirmation(order) {
+        // Debounced server confirmation of the quantities edited locally
+        clearTimeout(this.bomConfirmationTimer);
+        this.bomConfirmationTimer = setTimeout(async () => {
+            if (order.finalized) {
+                return;
+            }
+            const bomErrors = await order.validate_bom_stock_for_order();
+            if (bomErrors.length > 0) {
                 this.env.services.dialog.add(AlertDialog, {
-                    title: 'Validation Error',
-                    body: 'Failed to validate BOM stock. Please try again.',
+                    title: 'Insufficient Stock',
+                    body: bomErrors.map((error) =>
+                        `${error.product_name} (Qty: ${error.quantity}): ${error.error}`
+                    ).join('\n'),
                 });
-                return false; // Don't add to cart
             }
+        }, BOM_CONFIRMATION_DELAY);
+    },
+    
+    ensureBomFields(product) {
+        // Fetch missing BOM flags of a product, concurrent callers share one request
+        if (product.use_bom_in_pos !== undefined && product.has_bom !== undefined) {
+            return Promise.resolve();
+        }
+        if (!this.bomFieldRequests.has(product.id)) {
+            this.bomDebug('BOM fields undefined, fetching from backend for product:', product.display_name);
+            const request = this.env.services.orm.call(
+                'product.product',
+                'read',
+                [[product.id], ['use_bom_in_pos', 'has_bom']]
+            ).then((bomData) => {
+                if (bomData && bomData.length > 0) {
+                    product.use_bom_in_pos = bomData[0].use_bom_in_pos;
+                    product.has_bom = bomData[0].has_bom;
+                    this.bomDebug('Updated product BOM fields:', product.use_bom_in_pos, product.has_bom);
+                }
+            }).catch((error) => {
+                // Continue without BOM validation if we can't fetch the data
+                console.error('Failed to fetch BOM data for product:', error);
+            }).finally(() => {
+                this.bomFieldRequests.delete(product.id);
+            });
+            this.bomFieldRequests.set(product.id, request);
+        }
+        return this.bomFieldRequests.get(product.id);
+    },
+    
+    ensureBomComponents(product) {
+        // Products loaded after startup (product search, limited loading) come without
+        // components: fetch them with the stock of the components not in the ledger yet
+        if (!(product.use_bom_in_pos && product.has_bom) || product.bom_components) {
+            return Promise.resolve();
+        }
+        if (!this.bomComponentRequests.has(product.id)) {
+            const templateId = product.product_tmpl_id[0];
+            const request = this.env.services.orm.call(
+                'pos.session',
+                'get_pos_bom_components',
+                [[this.pos_session.id], [templateId]]
+            ).then((result) => {
+                // Components already in the ledger keep the deltas applied to them
+                for (const [componentId, quantity] of Object.entries(result.stock)) {
+                    if (!(componentId in this.bomStock)) {
+                        this.bomStock[componentId] = quantity;
+                    }
+                }
+                this.setBomComponents(product, result.components[templateId] || []);
+                this.indexBomProduct(product);
+                this.updateBomMaxQty([templateId]);
+            }).catch((error) => {
+                console.error('Failed to load BOM components for product:', error);
+            }).finally(() => {
+                this.bomComponentRequests.delete(product.id);
+            });
+            this.bomComponentRequests.set(product.id, request);
+        }
+        return this.bomComponentRequests.get(product.id);
+    },
+    
+    validateBomProduct(product, quantity) {
+        // Single click-time validation pipeline for the product card and Order.add_product.
+        // Results are memoized per product and quantity until bumpBomRevision(), so one
+        // tap validates once and quick repeated taps share the in-flight promise.
+        const key = `${product.id}:${quantity}`;
+        if (!this.bomValidations.has(key)) {
+            this.bomValidations.set(key, this.ensureBomFields(product).then(
+                () => this.ensureBomComponents(product)
+            ).then(() => {
+                if (product.use_bom_in_pos && product.has_bom && !product.bom_components) {
+                    // Components could not be loaded: the server confirms the order instead
+                    this.bomValidations.delete(key);
+                    this.scheduleBomConfirmation(this.get_order());
+                    return { valid: true };
+                }
+                this.bomDebug('Validating BOM product:', product.display_name, 'qty:', quantity);
+                return this.checkBomStockLocally(product, quantity);
+            }));
+        }
+        return this.bomValidations.get(key);
+    },
+    
+    async addProductToCurrentOrder(product, options = {}) {
+        // Validate BOM stock before adding product to cart (product card click)
+        const validation = await this.validateBomProduct(product, options.quantity || 1);
+        if (!validation.valid) {
+            this.env.services.dialog.add(AlertDialog, {
+                title: 'Insufficient Stock',
+                body: validation.error,
+            });
+            return false; // Don't add to cart
         }
         
         // If validation passed or not a BOM product, proceed with normal add
         return super.addProductToCurrentOrder(product, options);
     },
+    
+    removeOrder(order) {
+        const result = super.removeOrder(...arguments);
+        this.bumpBomRevision();
+        return result;
+    },
 });
 
 // Patch Order to handle BOM validation
 patch(Order.prototype, {
     async add_product(product, options) {
-        console.log('Order.add_product called for:', product.display_name || product.name, 'BOM enabled:', product.use_bom_in_pos, 'Has BOM:', product.has_bom);
-        
-        // If BOM fields are undefined, try to fetch them from backend
-        if (product.use_bom_in_pos === undefined || product.has_bom === undefined) {
-            console.log('BOM fields undefined, fetching from backend for product:', product.display_name);
-            try {
-                const bomData = await this.env.services.orm.call(
-                    'product.product',
-                    'read',
-                    [[product.id], ['use_bom_in_pos', 'has_bom']]
-                );
-                
-                if (bomData && bomData.length > 0) {
-                    product.use_bom_in_pos = bomData[0].use_bom_in_pos;
-                    product.has_bom = bomData[0].has_bom;
-                    console.log('Updated product BOM fields:', product.use_bom_in_pos, product.has_bom);
-                }
-            } catch (error) {
-                console.error('Failed to fetch BOM data for product:', error);
-                // Continue without BOM validation if we can't fetch the data
-                return super.add_product(product, options);
-            }
-        }
-        
-        // Enhanced BOM stock validation before adding product
-        if (product.use_bom_in_pos && product.has_bom) {
-            console.log('Validating BOM product in add_product:', product.display_name);
-            const qty = (options && options.quantity) || 1;
-            
-            // Use RPC for real-time validation
-            try {
-                const validation = await this.env.services.orm.call(
-                    'pos.order',
-                    'validate_bom_stock_rpc',
-                    [product.id, qty, this.pos.config.id]
-                );
-                
-                if (!validation.valid) {
-                    this.env.services.dialog.add(AlertDialog, {
-                        title: 'Insufficient Stock',
-                        body: validation.error,
-                    });
-                    return false;
-                }
-            } catch (error) {
-                console.error('BOM validation error:', error);
-                this.env.services.dialog.add(AlertDialog, {
-                    title: 'Validation Error',
-                    body: 'Failed to validate BOM stock. Please try again.',
-                });
-                return false;
-            }
+        // Shares the validation of the product card click, which is memoized
+        const validation = await this.pos.validateBomProduct(product, (options && options.quantity) || 1);
+        if (!validation.valid) {
+            this.env.services.dialog.add(AlertDialog, {
+                title: 'Insufficient Stock',
+                body: validation.error,
+            });
+            return false;
         }
         
         return super.add_product(product, options);
     },
     
+    add_orderline(line) {
+        const result = super.add_orderline(...arguments);
+        this.pos.bumpBomRevision();
+        return result;
+    },
+    
+    removeOrderline(line) {
+        const result = super.removeOrderline(...arguments);
+        this.pos.bumpBomRevision();
+        return result;
+    },
+    
     async validate_bom_stock_for_order() {
-        // Validate BOM stock for all order lines
-        const bomErrors = [];
+        // Validate BOM stock for all order lines with a single server call
+        const bomLines = this.orderlines.filter(
+            (line) => line.product.use_bom_in_pos && line.product.has_bom
+        );
+        if (bomLines.length === 0) {
+            return [];
+        }
         
-        for (const line of this.orderlines) {
-            const product = line.product;
-            if (product.use_bom_in_pos && product.has_bom) {
-                try {
-                    const validation = await this.env.services.orm.call(
-                        'pos.order',
-                        'validate_bom_stock_rpc',
-                        [product.id, line.quantity, this.pos.config.id]
-                    );
-                    
-                    if (!validation.valid) {
-                        bomErrors.push({
-                            product_name: product.display_name,
-                            quantity: line.quantity,
-                            error: validation.error
-                        });
-                    }
-                } catch (error) {
-                    console.error('BOM validation error for product:', product.display_name, error);
-                    bomErrors.push({
-                        product_name: product.display_name,
-                        quantity: line.quantity,
-                        error: 'Failed to validate BOM stock'
-                    });
-                }
+        try {
+            const validation = await this.env.services.orm.call(
+                'pos.order',
+                'validate_bom_stock_lines',
+                [
+                    bomLines.map((line) => ({ product_id: line.product.id, qty: line.quantity })),
+                    this.pos.config.id,
+                    this.uid,
+                ]
+            );
+            this.bom_degraded_validation = false;
+            
+            return validation.errors.map((error) => {
+                const line = bomLines[error.index];
+                return {
+                    product_name: line ? line.product.display_name : error.product_name,
+                    quantity: line ? line.quantity : error.quantity,
+                    error: error.error,
+                };
+            });
+        } catch (error) {
+            if (error instanceof ConnectionLostError) {
+                // Offline: fall back to the local ledger and flag the order for reconciliation
+                this.bom_degraded_validation = true;
+                return this.pos.checkBomOrderLocally(this);
             }
+            console.error('BOM validation error for order:', error);
+            return bomLines.map((line) => ({
+                product_name: line.product.display_name,
+                quantity: line.quantity,
+                error: 'Failed to validate BOM stock'
+            }));
         }
-        
-        return bomErrors;
     },
     
     async pay() {
@@ -213,6 +714,17 @@ patch(Order.prototype, {
         return super.pay(...arguments);
     },
     
+    init_from_JSON(json) {
+        super.init_from_JSON(...arguments);
+        this.bom_degraded_validation = json.bom_degraded_validation || false;
+    },
+    
+    export_as_JSON() {
+        const json = super.export_as_JSON();
+        json.bom_degraded_validation = this.bom_degraded_validation || false;
+        return json;
+    },
+    
     export_for_printing() {
         const result = super.export_for_printing();
         
@@ -233,6 +745,51 @@ patch(Order.prototype, {
 
 // Patch Orderline to show BOM information
 patch(Orderline.prototype, {
+    set_quantity(quantity, keep_price) {
+        // Lines being restored or built are not in their order yet and paid
+        // orders hold no pending demand, those changes reset the ledger instead
+        const inCart = Boolean(
+            this.pos && this.order && !this.order.bom_committed && this.order.orderlines.includes(this)
+        );
+        const isBom = this.product && this.product.use_bom_in_pos && this.product.has_bom;
+        const previous = this.get_quantity() || 0;
+        
+        if (inCart && isBom && quantity !== 'remove') {
+            const requested = typeof quantity === 'number' ? quantity : parseFloat(quantity) || 0;
+            const validation = this.pos.checkBomQuantityDelta(this.product, requested - previous);
+            if (!validation.valid) {
+                this.env.services.dialog.add(AlertDialog, {
+                    title: 'Insufficient Stock',
+                    body: validation.error,
+                });
+                return false;
+            }
+        }
+        
+        const result = super.set_quantity(...arguments);
+        if (inCart) {
+            const delta = (this.get_quantity() || 0) - previous;
+            this.pos.applyBomQuantityDelta(this.product, delta);
+            // Only explicit quantity edits are confirmed by the server, taps on a product
+            // already in the cart merge into its line and were checked locally
+            if (isBom && delta > 0 && !this.bomMerging) {
+                this.pos.scheduleBomConfirmation(this.order);
+            }
+        } else if (this.pos) {
+            this.pos.bumpBomRevision();
+        }
+        return result;
+    },
+    
+    merge(orderline) {
+        this.bomMerging = true;
+        try {
+            return super.merge(...arguments);
+        } finally {
+            this.bomMerging = false;
+        }
+    },
+    
     get_bom_info() {
         if (this.product.use_bom_in_pos && this.product.has_bom) {
             return {
@@ -247,12 +804,25 @@ patch(Orderline.prototype, {
     export_as_JSON() {
         const json = super.export_as_JSON();
         
-        // Add BOM information to order line
-        if (this.product.use_bom_in_pos && this.product.has_bom) {
-            json.has_bom = true;
-            json.bom_components = this.product.bom_components || [];
+        // Lines only reference the BOM, the server resolves its components
+        if (this.product.use_bom_in_pos && this.product.has_bom && this.product.bom_id) {
+            json.bom_id = this.product.bom_id;
         }
         
         return json;
     },
 });
+
+// Patch ProductCard to show how many units of a BOM product can still be sold
+patch(ProductCard.prototype, {
+    setup() {
+        super.setup(...arguments);
+        this.pos = usePos();
+    },
+    
+    get bomMaxQty() {
+        const product = this.pos.db.get_product_by_id(this.props.productId);
+        const maxQty = product ? this.pos.getBomMaxQty(product) : null;
+        return maxQty === null ? null : Math.floor(maxQty + 1e-9);
+    },
+});
@@ -0,0 +1,29 @@
+/** @odoo-module */
+
+import * as ProductScreen from "@point_of_sale/../tests/tours/helpers/ProductScreenTourMethods";
+import * as PaymentScreen from "@point_of_sale/../tests/tours/helpers/PaymentScreenTourMethods";
+import * as ReceiptScreen from "@point_of_sale/../tests/tours/helpers/ReceiptScreenTourMethods";
+import { registry } from "@web/core/registry";
+
+// Same as LINES_PER_ORDER in tests/test_bom_payload.py
+const LINES_PER_ORDER = 10;
+
+// Sell one unit of every BOM product of the payload fixture, the server measures the synced order
+registry.category("web_tour.tours").add("PosBomPayloadTour", {
+    test: true,
+    url: "/pos/ui",
+    steps: () =>
+        [
+            ProductScreen.confirmOpeningPopup(),
+            ProductScreen.clickHomeCategory(),
+            ...Array.from({ length: LINES_PER_ORDER }, (_, index) => [
+                ProductScreen.clickDisplayedProduct(`Payload BOM Product ${index}`),
+                // Products are added once their BOM stock is validated
+                ProductScreen.selectedOrderlineHas(`Payload BOM Product ${index}`),
+            ]),
+            ProductScreen.clickPayButton(),
+            PaymentScreen.clickPaymentMethod("Bank"),
+            PaymentScreen.clickValidate(),
+            ReceiptScreen.isShown(),
+        ].flat(2),
+});
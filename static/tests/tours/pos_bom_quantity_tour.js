@@ -0,0 +1,36 @@
+/** @odoo-module */
+
+import * as ProductScreen from "@point_of_sale/../tests/tours/helpers/ProductScreenTourMethods";
+import { registry } from "@web/core/registry";
+
+// Longer than BOM_CONFIRMATION_DELAY, so a scheduled server confirmation would have been sent
+const CONFIRMATION_WAIT = 1500;
+
+// Tap a BOM product three times, the server counts the BOM validation calls it receives
+registry.category("web_tour.tours").add("PosBomRepeatedTapsTour", {
+    test: true,
+    url: "/pos/ui",
+    steps: () =>
+        [
+            ProductScreen.confirmOpeningPopup(),
+            ProductScreen.clickHomeCategory(),
+            ProductScreen.clickDisplayedProduct("Tapped BOM Product"),
+            ProductScreen.selectedOrderlineHas("Tapped BOM Product", "1"),
+            ProductScreen.clickDisplayedProduct("Tapped BOM Product"),
+            ProductScreen.selectedOrderlineHas("Tapped BOM Product", "2"),
+            ProductScreen.clickDisplayedProduct("Tapped BOM Product"),
+            ProductScreen.selectedOrderlineHas("Tapped BOM Product", "3"),
+            {
+                content: "Wait past the confirmation delay",
+                trigger: ".product-screen",
+                run: () => {
+                    setTimeout(() => document.body.classList.add("o_pos_bom_waited"), CONFIRMATION_WAIT);
+                },
+            },
+            {
+                content: "The confirmation delay is over",
+                trigger: "body.o_pos_bom_waited",
+                isCheck: true,
+            },
+        ].flat(),
+});
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+
+from . import test_bom_batch_validation
+from . import test_bom_bulk_moves
+from . import test_bom_deferred_deduction
+from . import test_bom_explosion
+from . import test_bom_frontend
+from . import test_bom_max_qty
+from . import test_bom_metrics
+from . import test_bom_offline_reconciliation
+from . import test_bom_payload
+from . import test_bom_performance
+from . import test_bom_reservation
+from . import test_bom_stock_notification
+from . import test_bom_sync_isolation
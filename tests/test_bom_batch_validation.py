@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests.common import TransactionCase
+
+
+class TestBOMBatchValidation(TransactionCase):
+    """Test suite for the aggregated BOM stock validation"""
+
+    def setUp(self):
+        super().setUp()
+
+        self.shared_component = self.env['product.product'].create({
+            'name': 'Shared Component',
+            'type': 'product',
+        })
+
+        self.product_a = self._create_bom_product('Product A', 2.0)
+        self.product_b = self._create_bom_product('Product B', 3.0)
+
+        self.env['stock.quant']._update_available_quantity(
+            self.shared_component, self.env.ref('stock.stock_location_stock'), 4.0
+        )
+
+    def _create_bom_product(self, name, component_qty):
+        """Helper method to create a POS BOM product using the shared component"""
+        product = self.env['product.product'].create({
+            'name': name,
+            'type': 'product',
+            'use_bom_in_pos': True,
+        })
+        self.env['mrp.bom'].create({
+            'product_tmpl_id': product.product_tmpl_id.id,
+            'product_qty': 1.0,
+            'bom_line_ids': [(0, 0, {
+                'product_id': self.shared_component.id,
+                'product_qty': component_qty,
+            })],
+        })
+        return product
+
+    def test_lines_pass_individually(self):
+        """Each line alone fits in the available stock"""
+        self.assertTrue(self.product_a.product_tmpl_id.validate_bom_stock(1)['valid'])
+        self.assertTrue(self.product_b.product_tmpl_id.validate_bom_stock(1)['valid'])
+
+    def test_shared_component_over_consumption(self):
+        """Two lines sharing a component are checked against their summed demand"""
+        validation = self.env['product.template'].validate_bom_stock_batch([
+            (self.product_a.product_tmpl_id, 1),
+            (self.product_b.product_tmpl_id, 1),
+        ])
+
+        self.assertFalse(validation['valid'])
+        self.assertEqual(len(validation['errors']), 1)
+        error = validation['errors'][0]
+        self.assertEqual(error['component_id'], self.shared_component.id)
+        self.assertEqual(error['available'], 4.0)
+        self.assertEqual(error['required'], 5.0)
+        self.assertEqual(error['lines'], [0, 1])
+
+    def test_ui_order_validation_uses_aggregated_demand(self):
+        """create_from_ui validation rejects orders whose lines over-consume together"""
+        order_data = {
+            'lines': [
+                [0, 0, {'product_id': self.product_a.id, 'qty': 1}],
+                [0, 0, {'product_id': self.product_b.id, 'qty': 1}],
+            ],
+        }
+
+        check = self.env['pos.order']._check_orders_bom_stock_from_ui([order_data])
+        self.assertEqual(len(check['breaches']), 1)
+        self.assertIn('Shared Component', check['breaches'][0]['errors'][0]['error'])
+
+    def test_bulk_sync_reports_breaching_orders(self):
+        """Orders of one sync are checked against the stock left by the earlier ones"""
+        orders_data = [{
+            'uid': f'00001-001-000{i}',
+            'name': f'Order 00001-001-000{i}',
+            'lines': [[0, 0, {'product_id': self.product_a.id, 'qty': 1}]],
+        } for i in range(3)]
+
+        check = self.env['pos.order']._check_orders_bom_stock_from_ui(orders_data)
+
+        self.assertEqual([breach['index'] for breach in check['breaches']], [2])
+        self.assertEqual(check['breaches'][0]['uid'], '00001-001-0002')
+        self.assertEqual(check['breaches'][0]['errors'][0]['available'], 0.0)
+        self.assertEqual(check['component_count'], 1)
+
+    def test_sessions_sharing_a_location_share_a_ledger(self):
+        """Orders of two registers on the same location cannot oversell together"""
+        sessions = self.env['pos.session']
+        for name in ('Ledger Register 1', 'Ledger Register 2'):
+            config = self.env['pos.config'].create({'name': name})
+            sessions |= self.env['pos.session'].create({'config_id': config.id})
+        orders_data = [{
+            'uid': f'00002-001-000{i}',
+            'name': f'Order 00002-001-000{i}',
+            'pos_session_id': sessions[i % 2].id,
+            'lines': [[0, 0, {'product_id': self.product_a.id, 'qty': 1}]],
+        } for i in range(3)]
+
+        check = self.env['pos.order']._check_orders_bom_stock_from_ui(orders_data)
+
+        self.assertEqual([breach['index'] for breach in check['breaches']], [2])
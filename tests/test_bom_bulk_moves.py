@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests.common import TransactionCase
+
+
+class TestBOMBulkMoves(TransactionCase):
+    """Test suite for the bulk creation of BOM stock moves"""
+
+    def setUp(self):
+        super().setUp()
+
+        self.bread = self.env['product.product'].create({'name': 'Bulk Bread', 'type': 'product'})
+        self.cheese = self.env['product.product'].create({'name': 'Bulk Cheese', 'type': 'product'})
+
+        # Both products use bread, moves merged per component would mix the lines
+        self.sandwich = self._create_bom_product('Bulk Sandwich', [(self.bread, 2.0), (self.cheese, 1.0)])
+        self.toast = self._create_bom_product('Bulk Toast', [(self.bread, 1.0)])
+
+        stock_location = self.env.ref('stock.stock_location_stock')
+        self.env['stock.quant']._update_available_quantity(self.bread, stock_location, 100.0)
+        self.env['stock.quant']._update_available_quantity(self.cheese, stock_location, 100.0)
+
+        self.pos_config = self.env['pos.config'].create({'name': 'Bulk POS Config'})
+        self.pos_session = self.env['pos.session'].create({'config_id': self.pos_config.id})
+
+    def _create_bom_product(self, name, lines):
+        """Helper method to create a product sold with its BOM in POS"""
+        product = self.env['product.product'].create({
+            'name': name,
+            'type': 'product',
+            'use_bom_in_pos': True,
+        })
+        self.env['mrp.bom'].create({
+            'product_tmpl_id': product.product_tmpl_id.id,
+            'product_qty': 1.0,
+            'bom_line_ids': [
+                (0, 0, {'product_id': component.id, 'product_qty': quantity})
+                for component, quantity in lines
+            ],
+        })
+        return product
+
+    def _create_orders(self):
+        """Helper method to create two orders selling both BOM products"""
+        orders = self.env['pos.order']
+        for quantity in (1.0, 3.0):
+            orders |= self.env['pos.order'].create({
+                'session_id': self.pos_session.id,
+                'lines': [(0, 0, {
+                    'product_id': product.id,
+                    'qty': quantity,
+                    'price_unit': 1.0,
+                    'price_subtotal': quantity,
+                    'price_subtotal_incl': quantity,
+                }) for product in (self.sandwich, self.toast)],
+                'amount_total': 2 * quantity,
+                'amount_tax': 0.0,
+                'amount_paid': 2 * quantity,
+                'amount_return': 0.0,
+            })
+        return orders
+
+    def _summarize(self, orders, moves):
+        """Helper method to describe moves independently of the orders' names"""
+        positions = {order.name: index for index, order in enumerate(orders)}
+        for move in moves:
+            self.assertEqual(move.state, 'done')
+            self.assertEqual(move.picking_id.origin, move.origin)
+            self.assertEqual(move.picking_id.state, 'done')
+        return sorted(
+            (positions[move.origin], move.product_id.id, move.product_uom_qty)
+            for move in moves
+        )
+
+    def test_bulk_moves_match_per_line_moves(self):
+        """Bulk creation gives the moves, quantities and pickings of per-line creation"""
+        per_line_orders = self._create_orders()
+        per_line_moves = self.env['stock.move']
+        for line in per_line_orders.lines:
+            per_line_moves |= line._create_bom_inventory_moves()
+
+        bulk_orders = self._create_orders()
+        bulk_moves = bulk_orders.lines._create_bom_inventory_moves()
+
+        self.assertEqual(len(bulk_moves), 6)
+        self.assertEqual(
+            self._summarize(bulk_orders, bulk_moves),
+            self._summarize(per_line_orders, per_line_moves),
+        )
+        self.assertEqual(len(bulk_moves.picking_id), 2)
+        self.assertEqual(self.bread.qty_available, 100.0 - 2 * (3 * 1.0 + 3 * 3.0))
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+from unittest.mock import patch
+
+from odoo.exceptions import UserError
+from odoo.tests.common import TransactionCase
+
+
+class TestBOMDeferredDeduction(TransactionCase):
+    """Test suite for the queued posting of BOM component consumption"""
+
+    def setUp(self):
+        super().setUp()
+
+        self.component = self.env['product.product'].create({
+            'name': 'Queued Component',
+            'type': 'product',
+        })
+
+        self.product = self.env['product.product'].create({
+            'name': 'Queued BOM Product',
+            'type': 'product',
+            'use_bom_in_pos': True,
+        })
+        self.env['mrp.bom'].create({
+            'product_tmpl_id': self.product.product_tmpl_id.id,
+            'product_qty': 1.0,
+            'bom_line_ids': [(0, 0, {
+                'product_id': self.component.id,
+                'product_qty': 2.0,
+            })],
+        })
+
+        self.env['stock.quant']._update_available_quantity(
+            self.component, self.env.ref('stock.stock_location_stock'), 10.0
+        )
+
+        self.pos_config = self.env['pos.config'].create({
+            'name': 'Queued POS Config',
+            'bom_stock_deduction': 'queued',
+        })
+        self.pos_session = self.env['pos.session'].create({'config_id': self.pos_config.id})
+
+    def _create_order(self):
+        """Helper method to create a POS order selling one BOM product"""
+        return self.env['pos.order'].create({
+            'session_id': self.pos_session.id,
+            'lines': [(0, 0, {
+                'product_id': self.product.id,
+                'qty': 1.0,
+                'price_unit': 10.0,
+                'price_subtotal': 10.0,
+                'price_subtotal_incl': 10.0,
+            })],
+            'amount_total': 10.0,
+            'amount_tax': 0.0,
+            'amount_paid': 10.0,
+            'amount_return': 0.0,
+        })
+
+    def test_sync_only_records_consumption(self):
+        """Queued orders keep stock untouched until the queue posts them"""
+        order = self._create_order()
+        order._process_bom_inventory_moves()
+
+        self.assertEqual(order.bom_stock_state, 'pending')
+        self.assertEqual(len(order.bom_consumption_ids), 1)
+        self.assertEqual(order.bom_consumption_ids.quantity, 2.0)
+        self.assertEqual(self.component.qty_available, 10.0)
+
+    def test_queue_posts_each_order_once(self):
+        """The scheduled action posts pending consumption exactly once"""
+        order = self._create_order()
+        order._process_bom_inventory_moves()
+        order._process_bom_inventory_moves()
+
+        Consumption = self.env['pos.bom.consumption']
+        Consumption._cron_post_pending_consumption()
+        Consumption._cron_post_pending_consumption()
+
+        self.assertEqual(order.bom_stock_state, 'done')
+        self.assertTrue(order.bom_consumption_ids.move_id)
+        self.assertEqual(self.component.qty_available, 8.0)
+
+    def test_failed_posting_is_retried(self):
+        """A posting failure keeps the order pending and records the error"""
+        order = self._create_order()
+        order._process_bom_inventory_moves()
+
+        with patch.object(
+            self.registry['pos.order.line'], '_create_bom_stock_moves', side_effect=UserError('Posting failed')
+        ):
+            self.env['pos.bom.consumption']._cron_post_pending_consumption()
+
+        self.assertEqual(order.bom_stock_state, 'pending')
+        self.assertEqual(order.bom_consumption_ids.attempts, 1)
+        self.assertIn('Posting failed', order.bom_consumption_ids.error)
+
+    def test_queue_posts_despite_shortfall(self):
+        """Stock used elsewhere before the queue runs does not fail the order"""
+        order = self._create_order()
+        order._process_bom_inventory_moves()
+
+        # The back office uses the stock the order was sold against
+        self.env['stock.quant']._update_available_quantity(
+            self.component, self.env.ref('stock.stock_location_stock'), -9.0
+        )
+        self.env['pos.bom.consumption']._cron_post_pending_consumption()
+
+        self.assertEqual(order.bom_stock_state, 'done')
+        self.assertEqual(order.bom_reconciliation_state, 'conflict')
+        self.assertEqual(self.component.qty_available, -1.0)
+
+    def test_mode_change_keeps_pending_consumption_posted(self):
+        """Consumption recorded before a deduction mode change is still posted"""
+        order = self._create_order()
+        order._process_bom_inventory_moves()
+        Consumption = self.env['pos.bom.consumption']
+
+        # Queued consumption of an open session switched to session mode waits for closing
+        self.pos_config.bom_stock_deduction = 'session'
+        Consumption._cron_post_pending_consumption()
+        self.assertEqual(order.bom_stock_state, 'pending')
+
+        # Closing posts it even though the config went back to immediate deduction
+        self.pos_config.bom_stock_deduction = 'immediate'
+        self.pos_session._post_bom_consumption_at_closing()
+        self.assertEqual(order.bom_stock_state, 'done')
+        self.assertEqual(self.component.qty_available, 8.0)
+
+    def test_closed_session_consumption_is_queued(self):
+        """The queue posts consumption a session in session mode left pending"""
+        self.pos_config.bom_stock_deduction = 'session'
+        order = self._create_order()
+        order._process_bom_inventory_moves()
+
+        self.pos_session.state = 'closed'
+        self.env['pos.bom.consumption']._cron_post_pending_consumption()
+
+        self.assertEqual(order.bom_stock_state, 'done')
+        self.assertEqual(self.component.qty_available, 8.0)
+
+    def test_session_closing_aggregates_consumption(self):
+        """Session mode posts one move per component for all orders at closing"""
+        self.pos_config.bom_stock_deduction = 'session'
+        orders = self._create_order() | self._create_order()
+        orders._process_bom_inventory_moves()
+
+        Consumption = self.env['pos.bom.consumption']
+        Consumption._cron_post_pending_consumption()
+        self.assertEqual(set(orders.mapped('bom_stock_state')), {'pending'})
+
+        self.pos_session._post_bom_consumption_at_closing()
+
+        move = orders.bom_consumption_ids.move_id
+        self.assertEqual(len(move), 1)
+        self.assertEqual(move.product_uom_qty, 4.0)
+        self.assertEqual(move.origin, self.pos_session.name)
+        self.assertEqual(set(orders.mapped('bom_stock_state')), {'done'})
+        self.assertEqual(self.component.qty_available, 6.0)
+
+    def test_session_closing_posts_despite_shortfall(self):
+        """Stock used elsewhere before closing does not block the session"""
+        self.pos_config.bom_stock_deduction = 'session'
+        orders = self._create_order() | self._create_order()
+        orders._process_bom_inventory_moves()
+
+        # The back office uses the stock the orders were sold against
+        self.env['stock.quant']._update_available_quantity(
+            self.component, self.env.ref('stock.stock_location_stock'), -9.0
+        )
+        self.pos_session._post_bom_consumption_at_closing()
+
+        self.assertEqual(set(orders.mapped('bom_stock_state')), {'done'})
+        self.assertEqual(set(orders.mapped('bom_reconciliation_state')), {'conflict'})
+        self.assertEqual(self.component.qty_available, -3.0)
+
+    def test_unposted_consumption_is_not_available(self):
+        """Validation does not sell stock already consumed by queued orders"""
+        self._create_order()._process_bom_inventory_moves()
+        template = self.product.product_tmpl_id
+
+        self.assertTrue(template.validate_bom_stock(4, self.pos_config)['valid'])
+        self.assertFalse(template.validate_bom_stock(5, self.pos_config)['valid'])
+
+        check = self.env['pos.order']._check_orders_bom_stock_from_ui([{
+            'pos_session_id': self.pos_session.id,
+            'lines': [[0, 0, {'product_id': self.product.id, 'qty': 5}]],
+        }])
+        self.assertEqual(len(check['breaches']), 1)
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests.common import TransactionCase
+
+
+class TestBOMExplosion(TransactionCase):
+    """Test suite for the multi-level explosion of POS BOMs"""
+
+    def setUp(self):
+        super().setUp()
+
+        self.uom_unit = self.env.ref('uom.product_uom_unit')
+        self.uom_dozen = self.env.ref('uom.product_uom_dozen')
+
+        self.bun = self.env['product.product'].create({'name': 'Bun', 'type': 'product'})
+        self.tomato = self.env['product.product'].create({'name': 'Tomato', 'type': 'product'})
+        self.mayo = self.env['product.product'].create({'name': 'Mayo', 'type': 'product'})
+
+        # Sauce kit: a batch of 4 portions uses 2 tomatoes and 1 mayo
+        self.sauce = self.env['product.product'].create({'name': 'Sauce', 'type': 'consu'})
+        self.env['mrp.bom'].create({
+            'product_tmpl_id': self.sauce.product_tmpl_id.id,
+            'product_qty': 4.0,
+            'type': 'phantom',
+            'bom_line_ids': [
+                (0, 0, {'product_id': self.tomato.id, 'product_qty': 2.0}),
+                (0, 0, {'product_id': self.mayo.id, 'product_qty': 1.0}),
+            ],
+        })
+
+        # Burger: three bun slices counted in dozens, one sauce portion and one tomato
+        self.burger = self.env['product.product'].create({
+            'name': 'Burger',
+            'type': 'product',
+            'use_bom_in_pos': True,
+        })
+        self.env['mrp.bom'].create({
+            'product_tmpl_id': self.burger.product_tmpl_id.id,
+            'product_qty': 1.0,
+            'bom_line_ids': [
+                (0, 0, {'product_id': self.bun.id, 'product_qty': 0.25, 'product_uom_id': self.uom_dozen.id}),
+                (0, 0, {'product_id': self.sauce.id, 'product_qty': 1.0}),
+                (0, 0, {'product_id': self.tomato.id, 'product_qty': 1.0}),
+            ],
+        })
+
+    def test_nested_kit_is_flattened(self):
+        """Phantom children are exploded and shared components are summed"""
+        components = {
+            component['product_id']: component
+            for component in self.burger.product_tmpl_id.get_bom_components()
+        }
+
+        self.assertNotIn(self.sauce.id, components)
+        self.assertAlmostEqual(components[self.bun.id]['quantity'], 3.0)
+        self.assertEqual(components[self.bun.id]['uom_id'], self.uom_unit.id)
+        self.assertAlmostEqual(components[self.tomato.id]['quantity'], 1.5)
+        self.assertAlmostEqual(components[self.mayo.id]['quantity'], 0.25)
+        self.assertEqual(components[self.mayo.id]['level'], 1)
+
+    def test_kit_change_reindexes_parents(self):
+        """Changing a kit's BOM updates the indexed components of its parents"""
+        self.sauce.product_tmpl_id.bom_ids.bom_line_ids.filtered(
+            lambda line: line.product_id == self.mayo
+        ).product_qty = 2.0
+
+        index = self.env['pos.bom.component.index'].search([
+            ('template_id', '=', self.burger.product_tmpl_id.id),
+            ('component_id', '=', self.mayo.id),
+        ])
+        self.assertEqual(len(index), 1)
+        self.assertAlmostEqual(index.quantity, 0.5)
+
+    def test_index_follows_pos_flag(self):
+        """Only products sold with their BOM in POS are indexed"""
+        Index = self.env['pos.bom.component.index']
+        template = self.burger.product_tmpl_id
+        self.assertEqual(Index.search_count([('template_id', '=', template.id)]), 3)
+
+        template.use_bom_in_pos = False
+        self.assertFalse(Index.search_count([('template_id', '=', template.id)]))
+        self.assertEqual(template.get_bom_components(), [])
+
+    def test_catalog_version_follows_bom_changes(self):
+        """The POS catalog version only changes with the indexed components"""
+        Index = self.env['pos.bom.component.index']
+        template = self.burger.product_tmpl_id
+        catalog = Index._get_catalog_versions(template.ids)
+        self.assertEqual(Index._get_catalog_versions(template.ids), catalog)
+
+        self.sauce.product_tmpl_id.bom_ids.bom_line_ids.filtered(
+            lambda line: line.product_id == self.mayo
+        ).product_qty = 2.0
+
+        updated = Index._get_catalog_versions(template.ids)
+        self.assertNotEqual(updated['version'], catalog['version'])
+        self.assertNotEqual(updated['templates'][template.id], catalog['templates'][template.id])
+
+    def test_unrelated_bom_change_keeps_index(self):
+        """BOM changes that do not alter the POS components leave the index rows alone"""
+        Index = self.env['pos.bom.component.index']
+        rows = Index.search([('template_id', '=', self.burger.product_tmpl_id.id)])
+
+        self.burger.product_tmpl_id.bom_ids.code = 'BURGER'
+        self.assertEqual(Index.search([('template_id', '=', self.burger.product_tmpl_id.id)]), rows)
+
+        # Reordering the lines explodes into the same components
+        self.burger.product_tmpl_id.bom_ids.bom_line_ids[0].sequence = 99
+        self.assertEqual(Index.search([('template_id', '=', self.burger.product_tmpl_id.id)]), rows)
+
+        # A manufacturing BOM of a product not sold in POS is not indexed
+        bread = self.env['product.product'].create({'name': 'Bread', 'type': 'product'})
+        self.env['mrp.bom'].create({
+            'product_tmpl_id': bread.product_tmpl_id.id,
+            'bom_line_ids': [(0, 0, {'product_id': self.bun.id, 'product_qty': 1.0})],
+        })
+        self.assertFalse(Index.search_count([('template_id', '=', bread.product_tmpl_id.id)]))
+        self.assertEqual(Index.search([('template_id', '=', self.burger.product_tmpl_id.id)]), rows)
+
+    def test_component_cache_counts_hits(self):
+        """Components are read once per product until the index changes"""
+        template = self.burger.product_tmpl_id
+        template.get_bom_components()
+        stats = template.get_bom_cache_stats()
+
+        template.get_bom_components()
+        updated = template.get_bom_cache_stats()
+        self.assertEqual(updated['hits'], stats['hits'] + 1)
+        self.assertEqual(updated['misses'], stats['misses'])
+
+        self.sauce.product_tmpl_id.bom_ids.bom_line_ids.filtered(
+            lambda line: line.product_id == self.mayo
+        ).product_qty = 2.0
+        components = {component['product_id']: component for component in template.get_bom_components()}
+        self.assertAlmostEqual(components[self.mayo.id]['quantity'], 0.5)
+        self.assertEqual(template.get_bom_cache_stats()['misses'], updated['misses'] + 1)
+
+    def test_catalog_version_follows_language(self):
+        """Cached components are reused in the same language only"""
+        self.env['res.lang']._activate_lang('fr_FR')
+        Index = self.env['pos.bom.component.index']
+        template_ids = self.burger.product_tmpl_id.ids
+        catalog = Index.with_context(lang='en_US')._get_catalog_versions(template_ids)
+
+        # Same database and language: the cached components are still valid
+        self.assertEqual(Index.with_context(lang='en_US')._get_catalog_versions(template_ids), catalog)
+
+        # Another language: component names must be read again
+        translated = Index.with_context(lang='fr_FR')._get_catalog_versions(template_ids)
+        self.assertNotEqual(translated['scope'], catalog['scope'])
+        self.assertNotEqual(translated['version'], catalog['version'])
+        self.assertNotEqual(translated['templates'][template_ids[0]], catalog['templates'][template_ids[0]])
+        self.assertIn(self.env.cr.dbname, catalog['scope'])
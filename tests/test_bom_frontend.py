@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+from unittest.mock import patch
+
+from odoo import api
+from odoo.tests.common import tagged
+
+from odoo.addons.point_of_sale.tests.test_frontend import TestPointOfSaleHttpCommon
+
+
+@tagged('post_install', '-at_install')
+class TestBOMFrontend(TestPointOfSaleHttpCommon):
+    """Test suite for the BOM server traffic of the POS interface"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        component = cls.env['product.product'].create({'name': 'Tapped Component', 'type': 'product'})
+        cls.env['stock.quant']._update_available_quantity(
+            component, cls.main_pos_config.picking_type_id.default_location_src_id, 100.0
+        )
+        cls.product = cls.env['product.product'].create({
+            'name': 'Tapped BOM Product',
+            'type': 'product',
+            'use_bom_in_pos': True,
+            'available_in_pos': True,
+            'list_price': 10.0,
+            'taxes_id': False,
+        })
+        cls.env['mrp.bom'].create({
+            'product_tmpl_id': cls.product.product_tmpl_id.id,
+            'product_qty': 1.0,
+            'bom_line_ids': [(0, 0, {'product_id': component.id, 'product_qty': 1.0})],
+        })
+
+    def test_repeated_taps_send_no_validation(self):
+        """Taps on a product already in the cart are checked locally only"""
+        PosOrder = self.registry['pos.order']
+        calls = []
+
+        def count_calls(method_name):
+            method = getattr(PosOrder, method_name)
+
+            @api.model
+            def counted(model, *args, **kwargs):
+                calls.append(method_name)
+                return method(model, *args, **kwargs)
+            return patch.object(PosOrder, method_name, counted)
+
+        self.main_pos_config.with_user(self.pos_user).open_ui()
+        with count_calls('validate_bom_stock_lines'), count_calls('validate_bom_stock_rpc'):
+            self.start_tour(f"/pos/ui?config_id={self.main_pos_config.id}", 'PosBomRepeatedTapsTour', login="pos_user")
+
+        self.assertEqual(calls, [])
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests.common import TransactionCase
+
+
+class TestBOMMaxQty(TransactionCase):
+    """Test suite for the maximum sellable quantity of BOM products"""
+
+    def setUp(self):
+        super().setUp()
+
+        self.stock_location = self.env.ref('stock.stock_location_stock')
+        self.bread = self.env['product.product'].create({'name': 'Bread', 'type': 'product'})
+        self.patty = self.env['product.product'].create({'name': 'Patty', 'type': 'product'})
+
+        self.burger = self.env['product.product'].create({
+            'name': 'Max Qty Burger',
+            'type': 'product',
+            'use_bom_in_pos': True,
+            'available_in_pos': True,
+        })
+        self.env['mrp.bom'].create({
+            'product_tmpl_id': self.burger.product_tmpl_id.id,
+            'product_qty': 1.0,
+            'bom_line_ids': [
+                (0, 0, {'product_id': self.bread.id, 'product_qty': 2.0}),
+                (0, 0, {'product_id': self.patty.id, 'product_qty': 1.0}),
+            ],
+        })
+
+        self.env['stock.quant']._update_available_quantity(self.bread, self.stock_location, 10.0)
+        self.env['stock.quant']._update_available_quantity(self.patty, self.stock_location, 3.0)
+
+        self.pos_config = self.env['pos.config'].create({'name': 'Max Qty POS Config'})
+        self.pos_session = self.env['pos.session'].create({'config_id': self.pos_config.id})
+
+    def test_scarcest_component_limits(self):
+        """The maximum quantity is set by the scarcest component"""
+        template = self.burger.product_tmpl_id
+        max_qty = self.env['product.template']._get_bom_max_qty(
+            {template.id: template.get_bom_components()},
+            {self.bread.id: 10.0, self.patty.id: 3.0},
+        )
+        self.assertEqual(max_qty, {template.id: 3.0})
+
+    def test_snapshot_follows_stock(self):
+        """The stock snapshot sent to POS follows stock changes"""
+        self.env['stock.quant']._update_available_quantity(self.bread, self.stock_location, -6.0)
+        template = self.burger.product_tmpl_id
+
+        stock = self.pos_session._get_pos_bom_stock_snapshot([self.bread.id, self.patty.id])
+        max_qty = self.env['product.template']._get_bom_max_qty({template.id: template.get_bom_components()}, stock)
+
+        self.assertEqual(stock[self.bread.id], 4.0)
+        self.assertEqual(max_qty[template.id], 2.0)
+
+    def test_late_loaded_product_components(self):
+        """Products loaded after startup get their components and component stock"""
+        template = self.burger.product_tmpl_id
+
+        result = self.pos_session.get_pos_bom_components([template.id])
+
+        self.assertEqual(
+            {component['product_id'] for component in result['components'][template.id]},
+            {self.bread.id, self.patty.id},
+        )
+        self.assertEqual(result['stock'], {self.bread.id: 10.0, self.patty.id: 3.0})
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests.common import HttpCase, TransactionCase, new_test_user, tagged
+
+from odoo.addons.pos_bom_integration.models import bom_metrics
+
+
+class TestBOMMetrics(TransactionCase):
+    """Test suite for the instrumentation of the BOM hot paths"""
+
+    def setUp(self):
+        super().setUp()
+
+        components = self.env['product.product'].create([
+            {'name': f'Metered Component {i}', 'type': 'product'}
+            for i in range(3)
+        ])
+        self.product = self.env['product.product'].create({
+            'name': 'Metered BOM Product',
+            'type': 'product',
+            'use_bom_in_pos': True,
+        })
+        self.env['mrp.bom'].create({
+            'product_tmpl_id': self.product.product_tmpl_id.id,
+            'product_qty': 1.0,
+            'bom_line_ids': [
+                (0, 0, {'product_id': component.id, 'product_qty': 1.0})
+                for component in components
+            ],
+        })
+        self.pos_config = self.env['pos.config'].create({'name': 'Metered POS Config'})
+
+    def test_validation_records_sample(self):
+        """A validation RPC records its component count and is summarized"""
+        self.env['pos.order'].validate_bom_stock_rpc(self.product.id, 1, self.pos_config.id)
+
+        samples = bom_metrics.get_samples(self.env.cr.dbname, self.pos_config.id)
+        self.assertEqual(samples[-1]['operation'], 'validate_bom_stock_rpc')
+        self.assertEqual(samples[-1]['components'], 3)
+
+        summary = bom_metrics.summarize(samples)
+        self.assertEqual(summary['validate_bom_stock_rpc']['components_max'], 3)
+        self.assertIn(
+            'pos_bom_operation_calls_total{operation="validate_bom_stock_rpc"}',
+            bom_metrics.format_prometheus(summary),
+        )
+
+
+@tagged('post_install', '-at_install')
+class TestBOMMetricsRoute(HttpCase):
+    """Test suite for the access to the BOM metrics route"""
+
+    def test_metrics_route_is_manager_only(self):
+        """POS users are refused the metrics, POS managers get them"""
+        new_test_user(self.env, login='bom_pos_user', groups='point_of_sale.group_pos_user')
+        new_test_user(self.env, login='bom_pos_manager', groups='point_of_sale.group_pos_manager')
+
+        self.authenticate('bom_pos_user', 'bom_pos_user')
+        self.assertEqual(self.url_open('/pos_bom_integration/metrics').status_code, 403)
+
+        self.authenticate('bom_pos_manager', 'bom_pos_manager')
+        response = self.url_open('/pos_bom_integration/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('operations', response.json())
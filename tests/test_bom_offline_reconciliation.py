@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests.common import TransactionCase
+
+
+class TestBOMOfflineReconciliation(TransactionCase):
+    """Test suite for the reconciliation of orders validated offline"""
+
+    def setUp(self):
+        super().setUp()
+
+        self.component = self.env['product.product'].create({
+            'name': 'Offline Component',
+            'type': 'product',
+        })
+
+        self.product = self.env['product.product'].create({
+            'name': 'Offline BOM Product',
+            'type': 'product',
+            'use_bom_in_pos': True,
+        })
+        self.env['mrp.bom'].create({
+            'product_tmpl_id': self.product.product_tmpl_id.id,
+            'product_qty': 1.0,
+            'bom_line_ids': [(0, 0, {
+                'product_id': self.component.id,
+                'product_qty': 2.0,
+            })],
+        })
+
+        self.env['stock.quant']._update_available_quantity(
+            self.component, self.env.ref('stock.stock_location_stock'), 3.0
+        )
+
+        self.pos_config = self.env['pos.config'].create({'name': 'Offline POS Config'})
+        self.pos_session = self.env['pos.session'].create({'config_id': self.pos_config.id})
+
+    def _create_order(self, reference, qty):
+        """Helper method to create a POS order validated offline"""
+        return self.env['pos.order'].create({
+            'session_id': self.pos_session.id,
+            'pos_reference': reference,
+            'bom_degraded_validation': True,
+            'bom_reconciliation_state': 'pending',
+            'lines': [(0, 0, {
+                'product_id': self.product.id,
+                'qty': qty,
+                'price_unit': 10.0,
+                'price_subtotal': 10.0 * qty,
+                'price_subtotal_incl': 10.0 * qty,
+            })],
+            'amount_total': 10.0 * qty,
+            'amount_tax': 0.0,
+            'amount_paid': 10.0 * qty,
+            'amount_return': 0.0,
+        })
+
+    def test_offline_order_is_posted_and_reported(self):
+        """Stock of an offline order is posted even when it goes negative"""
+        order = self._create_order('Order 00001-001-0001', 2.0)
+        order._process_bom_inventory_moves()
+        self.assertEqual(self.component.qty_available, -1.0)
+
+        result = self.env['pos.order'].reconcile_bom_degraded_orders(
+            ['Order 00001-001-0001', 'Order 00001-001-0002'], self.pos_config.id
+        )
+
+        self.assertEqual(len(result['conflicts']), 1)
+        self.assertEqual(result['conflicts'][0]['component_id'], self.component.id)
+        self.assertEqual(result['conflicts'][0]['available'], -1.0)
+        self.assertEqual(result['conflicts'][0]['orders'], ['Order 00001-001-0001'])
+        self.assertEqual(result['pending'], ['Order 00001-001-0002'])
+        self.assertEqual(order.bom_reconciliation_state, 'conflict')
+
+    def test_offline_order_within_stock_is_reconciled(self):
+        """An offline order that fitted in the stock reconciles without conflict"""
+        order = self._create_order('Order 00001-001-0003', 1.0)
+        order._process_bom_inventory_moves()
+
+        result = self.env['pos.order'].reconcile_bom_degraded_orders(
+            ['Order 00001-001-0003'], self.pos_config.id
+        )
+
+        self.assertEqual(result, {'conflicts': [], 'pending': []})
+        self.assertEqual(order.bom_reconciliation_state, 'done')
+
+    def test_offline_flag_does_not_skip_sync_check(self):
+        """Orders flagged offline are checked at sync and their breaches reported"""
+        orders_data = [{
+            'uid': f'00001-001-000{i}',
+            'name': f'Order 00001-001-000{i}',
+            'pos_session_id': self.pos_session.id,
+            'bom_degraded_validation': not i,
+            'lines': [[0, 0, {'product_id': self.product.id, 'qty': 2 - i}]],
+        } for i in range(2)]
+
+        check = self.env['pos.order']._check_orders_bom_stock_from_ui(orders_data)
+
+        self.assertEqual([conflict['index'] for conflict in check['conflicts']], [0])
+        self.assertEqual(check['conflicts'][0]['errors'][0]['required'], 4.0)
+        # The offline order consumed the stock, the next one breaches
+        self.assertEqual([breach['index'] for breach in check['breaches']], [1])
+        self.assertEqual(check['breaches'][0]['errors'][0]['available'], -1.0)
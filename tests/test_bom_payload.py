@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+from unittest.mock import patch
+
+from odoo import api, fields
+from odoo.tests.common import TransactionCase, tagged
+
+from odoo.addons.point_of_sale.tests.test_frontend import TestPointOfSaleHttpCommon
+
+_logger = logging.getLogger(__name__)
+
+LINES_PER_ORDER = 10
+COMPONENTS_PER_BOM = 20
+# Budget of an exported line: the standard POS line fields and the BOM reference,
+# copying the components would add about 100 bytes per component
+MAX_BYTES_PER_LINE = 600
+
+
+class TestBOMPayload(TransactionCase):
+    """Test suite for the BOM references synced with POS orders"""
+
+    def setUp(self):
+        super().setUp()
+
+        components = self.env['product.product'].create([
+            {'name': f'Payload Component {i}', 'type': 'product'}
+            for i in range(COMPONENTS_PER_BOM)
+        ])
+        self.products = self.env['product.product'].create([
+            {'name': f'Payload BOM Product {i}', 'type': 'product', 'use_bom_in_pos': True}
+            for i in range(LINES_PER_ORDER)
+        ])
+        self.boms = self.env['mrp.bom'].create([{
+            'product_tmpl_id': product.product_tmpl_id.id,
+            'product_qty': 1.0,
+            'bom_line_ids': [
+                (0, 0, {'product_id': component.id, 'product_qty': 1.0})
+                for component in components
+            ],
+        } for product in self.products])
+
+        self.pos_config = self.env['pos.config'].create({'name': 'Payload POS Config'})
+        self.pos_session = self.env['pos.session'].create({'config_id': self.pos_config.id})
+
+    def _ui_order(self):
+        """Helper method to build a UI order whose lines reference their BOM"""
+        return {
+            'name': 'Order 00001-001-0001',
+            'uid': '00001-001-0001',
+            'pos_session_id': self.pos_session.id,
+            'user_id': self.env.uid,
+            'partner_id': False,
+            'sequence_number': 1,
+            'creation_date': fields.Datetime.to_string(fields.Datetime.now()),
+            'fiscal_position_id': False,
+            'pricelist_id': self.pos_config.pricelist_id.id,
+            'amount_paid': 10.0 * LINES_PER_ORDER,
+            'amount_total': 10.0 * LINES_PER_ORDER,
+            'amount_tax': 0.0,
+            'amount_return': 0.0,
+            'lines': [[0, 0, {
+                'product_id': product.id,
+                'qty': 1,
+                'price_unit': 10.0,
+                'price_subtotal': 10.0,
+                'price_subtotal_incl': 10.0,
+                'discount': 0,
+                'tax_ids': [[6, False, []]],
+                'bom_id': bom.id,
+            }] for product, bom in zip(self.products, self.boms)],
+        }
+
+    def test_deleted_bom_reference_is_dropped(self):
+        """Lines sold with a BOM deleted since are synced without reference"""
+        ui_order = self._ui_order()
+        deleted_bom = self.boms[0]
+        deleted_bom.unlink()
+
+        order_fields = self.env['pos.order']._order_fields(ui_order)
+
+        self.assertFalse(order_fields['lines'][0][2]['bom_id'])
+        self.assertTrue(order_fields['lines'][1][2]['bom_id'])
+
+    def test_line_consumes_its_bom(self):
+        """Lines sold with a BOM replaced since consume the BOM they were sold with"""
+        product = self.products[0]
+        sold_bom = self.boms[0]
+        order = self.env['pos.order'].create({
+            'session_id': self.pos_session.id,
+            'lines': [(0, 0, {
+                'product_id': product.id,
+                'qty': 2.0,
+                'price_unit': 10.0,
+                'price_subtotal': 20.0,
+                'price_subtotal_incl': 20.0,
+                'bom_id': sold_bom.id,
+            })],
+            'amount_total': 20.0,
+            'amount_tax': 0.0,
+            'amount_paid': 20.0,
+            'amount_return': 0.0,
+        })
+
+        new_component = self.env['product.product'].create({'name': 'Payload New Component', 'type': 'product'})
+        self.env['mrp.bom'].create({
+            'product_tmpl_id': product.product_tmpl_id.id,
+            'product_qty': 1.0,
+            'sequence': sold_bom.sequence - 1,
+            'bom_line_ids': [(0, 0, {'product_id': new_component.id, 'product_qty': 1.0})],
+        })
+        self.assertEqual(
+            [component['product_id'] for component in product.product_tmpl_id.get_bom_components()],
+            [new_component.id],
+        )
+
+        move_vals_list = order.lines._prepare_bom_moves_vals_list()
+
+        self.assertEqual(
+            {vals['product_id'] for vals in move_vals_list},
+            set(sold_bom.bom_line_ids.product_id.ids),
+        )
+        self.assertTrue(all(vals['product_uom_qty'] == 2.0 for vals in move_vals_list))
+
+
+@tagged('post_install', '-at_install')
+class TestBOMPayloadTour(TestPointOfSaleHttpCommon):
+    """Test suite for the size of the orders the POS actually exports"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        components = cls.env['product.product'].create([
+            {'name': f'Payload Component {i}', 'type': 'product'}
+            for i in range(COMPONENTS_PER_BOM)
+        ])
+        location = cls.main_pos_config.picking_type_id.default_location_src_id
+        for component in components:
+            cls.env['stock.quant']._update_available_quantity(component, location, 100.0)
+
+        cls.products = cls.env['product.product'].create([{
+            'name': f'Payload BOM Product {i}',
+            'type': 'product',
+            'use_bom_in_pos': True,
+            'available_in_pos': True,
+            'list_price': 10.0,
+            'taxes_id': False,
+        } for i in range(LINES_PER_ORDER)])
+        cls.boms = cls.env['mrp.bom'].create([{
+            'product_tmpl_id': product.product_tmpl_id.id,
+            'product_qty': 1.0,
+            'bom_line_ids': [
+                (0, 0, {'product_id': component.id, 'product_qty': 1.0})
+                for component in components
+            ],
+        } for product in cls.products])
+
+    def test_exported_order_payload_size(self):
+        """Lines exported by the POS reference their BOM instead of copying components"""
+        PosOrder = self.registry['pos.order']
+        create_from_ui = PosOrder.create_from_ui
+        exported = []
+
+        @api.model
+        def capture_create_from_ui(model, orders, draft=False):
+            exported.extend(orders)
+            return create_from_ui(model, orders, draft=draft)
+
+        self.main_pos_config.with_user(self.pos_user).open_ui()
+        with patch.object(PosOrder, 'create_from_ui', capture_create_from_ui):
+            self.start_tour(f"/pos/ui?config_id={self.main_pos_config.id}", 'PosBomPayloadTour', login="pos_user")
+
+        self.assertEqual(len(exported), 1)
+        ui_order = exported[0]['data']
+        lines = [line[2] for line in ui_order['lines']]
+        payload_size = len(json.dumps(ui_order))
+        lines_size = len(json.dumps(lines))
+        _logger.info(
+            "POS BOM payload: lines=%s components=%s payload=%s bytes lines=%s bytes",
+            LINES_PER_ORDER, COMPONENTS_PER_BOM, payload_size, lines_size
+        )
+
+        self.assertEqual(len(lines), LINES_PER_ORDER)
+        self.assertLessEqual(lines_size, MAX_BYTES_PER_LINE * LINES_PER_ORDER)
+        for line in lines:
+            self.assertNotIn('bom_components', line)
+            self.assertIn(line['bom_id'], self.boms.ids)
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""Benchmark suite for BOM validation and inventory posting
+
+The suite is opt-in, run it with ``--test-tags pos_bom_benchmark``. Catalog
+size is read from the POS_BOM_BENCH_PRODUCTS environment variable (default
+1000, meant to range up to 50000). Query counts are compared with the
+thresholds stored in bom_query_thresholds.json; run with
+POS_BOM_BENCH_UPDATE=1 to store the measured counts as the new thresholds.
+Outside update mode, a measurement without a stored threshold fails.
+"""
+
+import json
+import logging
+import os
+import random
+import time
+from contextlib import nullcontext
+
+from odoo.tests.common import TransactionCase, tagged
+
+_logger = logging.getLogger(__name__)
+
+THRESHOLDS_FILE = os.path.join(os.path.dirname(__file__), 'bom_query_thresholds.json')
+ORDER_SIZES = (1, 10, 50, 200)
+MOVE_ORDER_SIZES = (1, 10, 50)
+BULK_SYNC_ORDERS = 500
+
+
+@tagged('post_install', '-at_install', '-standard', 'pos_bom_benchmark')
+class TestBOMPerformance(TransactionCase):
+    """Query count and timing benchmarks on a synthetic BOM catalog"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.rng = random.Random(42)
+        cls.catalog_size = int(os.environ.get('POS_BOM_BENCH_PRODUCTS', 1000))
+        cls.update_thresholds = bool(os.environ.get('POS_BOM_BENCH_UPDATE'))
+        with open(THRESHOLDS_FILE) as thresholds_file:
+            cls.thresholds = json.load(thresholds_file)
+        cls.measurements = {}
+
+        cls.stock_location = cls.env.ref('stock.stock_location_stock')
+        cls._generate_catalog()
+
+        cls.pos_config = cls.env['pos.config'].create({'name': 'Benchmark POS'})
+        cls.pos_session = cls.env['pos.session'].create({'config_id': cls.pos_config.id})
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.update_thresholds:
+            with open(THRESHOLDS_FILE, 'w') as thresholds_file:
+                json.dump(dict(sorted(cls.measurements.items())), thresholds_file, indent=4)
+                thresholds_file.write('\n')
+        super().tearDownClass()
+
+    @classmethod
+    def _generate_catalog(cls):
+        """Create raw components, phantom kits and BOM products 1 to 30 lines deep"""
+        Product = cls.env['product.product']
+        Bom = cls.env['mrp.bom']
+
+        cls.components = Product.create([
+            {'name': f'Bench Component {i}', 'type': 'product'}
+            for i in range(max(50, cls.catalog_size // 10))
+        ])
+        for component in cls.components:
+            cls.env['stock.quant']._update_available_quantity(component, cls.stock_location, 1e6)
+
+        cls.kits = Product.create([
+            {'name': f'Bench Kit {i}', 'type': 'consu'}
+            for i in range(max(5, cls.catalog_size // 20))
+        ])
+        Bom.create([{
+            'product_tmpl_id': kit.product_tmpl_id.id,
+            'product_qty': 1.0,
+            'type': 'phantom',
+            'bom_line_ids': [
+                (0, 0, {'product_id': component.id, 'product_qty': 1.0})
+                for component in cls.rng.sample(list(cls.components), cls.rng.randint(2, 5))
+            ],
+        } for kit in cls.kits])
+
+        cls.bom_products = Product.create([
+            {'name': f'Bench Product {i}', 'type': 'product', 'use_bom_in_pos': True, 'available_in_pos': True}
+            for i in range(cls.catalog_size)
+        ])
+        bom_vals_list = []
+        for index, product in enumerate(cls.bom_products):
+            line_count = index % 30 + 1
+            line_products = cls.rng.sample(list(cls.components), min(line_count, len(cls.components)))
+            if index % 5 == 0:
+                line_products[-1] = cls.rng.choice(list(cls.kits))
+            bom_vals_list.append({
+                'product_tmpl_id': product.product_tmpl_id.id,
+                'product_qty': 1.0,
+                'bom_line_ids': [
+                    (0, 0, {'product_id': line_product.id, 'product_qty': 1.0})
+                    for line_product in line_products
+                ],
+            })
+        Bom.create(bom_vals_list)
+
+    def _measure(self, key, func):
+        """Run func, record its query count and timing and check its threshold"""
+        # Warm the registry caches, measure with a cold ORM cache
+        func()
+        self.env.invalidate_all()
+        if not (self.update_thresholds or key in self.thresholds):
+            self.fail(f"No query threshold stored for {key}, run with POS_BOM_BENCH_UPDATE=1 to store one")
+
+        cr = self.env.cr
+        with nullcontext() if self.update_thresholds else self.assertQueryCount(self.thresholds[key]):
+            start_queries = cr.sql_log_count
+            start = time.perf_counter()
+            func()
+            duration = time.perf_counter() - start
+            queries = cr.sql_log_count - start_queries
+
+        self.measurements[key] = queries
+        _logger.info(
+            "POS BOM benchmark: %s catalog=%s queries=%s duration=%.3fs",
+            key, self.catalog_size, queries, duration
+        )
+
+    def _order_data(self, line_count):
+        """Build UI order data with line_count lines of BOM products"""
+        products = self.rng.sample(list(self.bom_products), min(line_count, self.catalog_size))
+        return {
+            'pos_session_id': self.pos_session.id,
+            'lines': [[0, 0, {'product_id': product.id, 'qty': 1}] for product in products],
+        }
+
+    def _create_order(self, line_count):
+        """Create a POS order with line_count lines of BOM products"""
+        products = self.rng.sample(list(self.bom_products), min(line_count, self.catalog_size))
+        return self.env['pos.order'].create({
+            'session_id': self.pos_session.id,
+            'lines': [(0, 0, {
+                'product_id': product.id,
+                'qty': 1.0,
+                'price_unit': 1.0,
+                'price_subtotal': 1.0,
+                'price_subtotal_incl': 1.0,
+            }) for product in products],
+            'amount_total': float(len(products)),
+            'amount_tax': 0.0,
+            'amount_paid': float(len(products)),
+            'amount_return': 0.0,
+        })
+
+    def test_validate_bom_stock(self):
+        """Single product validation, deepest BOM of the catalog"""
+        template = self.bom_products[29].product_tmpl_id
+        self._measure('validate_bom_stock', lambda: template.validate_bom_stock(1, self.pos_config))
+
+    def test_create_from_ui_validation(self):
+        """BOM validation run by create_from_ui, per order size"""
+        PosOrder = self.env['pos.order']
+        for line_count in ORDER_SIZES:
+            order_data = self._order_data(line_count)
+            self._measure(
+                f'create_from_ui_validation_{line_count}_lines',
+                lambda: PosOrder._check_orders_bom_stock_from_ui([order_data])
+            )
+
+    def test_bulk_sync_validation(self):
+        """BOM validation of a register syncing a backlog of orders at once"""
+        orders_data = [self._order_data(5) for i in range(BULK_SYNC_ORDERS)]
+        self._measure(
+            f'create_from_ui_validation_{BULK_SYNC_ORDERS}_orders',
+            lambda: self.env['pos.order']._check_orders_bom_stock_from_ui(orders_data)
+        )
+
+    def test_process_bom_inventory_moves(self):
+        """Stock move posting, per order size"""
+        for line_count in MOVE_ORDER_SIZES:
+            orders = [self._create_order(line_count), self._create_order(line_count)]
+            self._measure(
+                f'process_bom_inventory_moves_{line_count}_lines',
+                lambda: orders.pop()._process_bom_inventory_moves()
+            )
+
+    def test_load_pos_products(self):
+        """Product loading of a POS session with the whole catalog"""
+        params = self.pos_session._loader_params_product_product()
+        self._measure(
+            'load_pos_products',
+            lambda: self.pos_session._get_pos_ui_product_product(params)
+        )
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests.common import TransactionCase
+
+
+class TestBOMReservation(TransactionCase):
+    """Test suite for the soft reservations placed by BOM stock validation"""
+
+    def setUp(self):
+        super().setUp()
+
+        self.component = self.env['product.product'].create({
+            'name': 'Reserved Component',
+            'type': 'product',
+        })
+
+        self.product = self.env['product.product'].create({
+            'name': 'Reserved BOM Product',
+            'type': 'product',
+            'use_bom_in_pos': True,
+        })
+        self.env['mrp.bom'].create({
+            'product_tmpl_id': self.product.product_tmpl_id.id,
+            'product_qty': 1.0,
+            'bom_line_ids': [(0, 0, {
+                'product_id': self.component.id,
+                'product_qty': 1.0,
+            })],
+        })
+
+        self.stock_location = self.env.ref('stock.stock_location_stock')
+        self.env['stock.quant']._update_available_quantity(self.component, self.stock_location, 1.0)
+
+        self.pos_config_1 = self.env['pos.config'].create({'name': 'Register 1'})
+        self.pos_config_2 = self.env['pos.config'].create({'name': 'Register 2'})
+        self.session_1 = self.env['pos.session'].create({'config_id': self.pos_config_1.id})
+        self.session_2 = self.env['pos.session'].create({'config_id': self.pos_config_2.id})
+
+    def _validate(self, session, order_uid=None):
+        """Helper method to validate one unit of the BOM product for a session"""
+        return self.product.product_tmpl_id.validate_bom_stock(
+            1, session.config_id, session, hold=True, order_uid=order_uid
+        )
+
+    def test_hold_blocks_other_register(self):
+        """The last unit validated by one register is not available to another"""
+        self.assertTrue(self._validate(self.session_1)['valid'])
+        self.assertFalse(self._validate(self.session_2)['valid'])
+
+    def test_own_hold_stays_available(self):
+        """A register can re-validate the components it is already holding"""
+        self.assertTrue(self._validate(self.session_1)['valid'])
+        self.assertTrue(self._validate(self.session_1)['valid'])
+
+    def test_expired_and_released_holds(self):
+        """Expired or released holds no longer reduce availability"""
+        Reservation = self.env['pos.bom.reservation']
+        self.assertTrue(self._validate(self.session_1)['valid'])
+
+        Reservation.search([('session_id', '=', self.session_1.id)]).write({
+            'expiration_date': fields.Datetime.now() - timedelta(seconds=1),
+        })
+        self.assertTrue(self._validate(self.session_2, 'Order 2')['valid'])
+
+        Reservation._release_order_holds(['Order 2'])
+        self.assertFalse(Reservation.search([('session_id', '=', self.session_2.id)]))
+        self.assertTrue(self._validate(self.session_1)['valid'])
+
+    def test_open_tickets_hold_separately(self):
+        """Each open ticket of a register keeps its own hold until it syncs"""
+        self.env['stock.quant']._update_available_quantity(self.component, self.stock_location, 1.0)
+        Reservation = self.env['pos.bom.reservation']
+
+        self.assertTrue(self._validate(self.session_1, 'Ticket 1')['valid'])
+        self.assertTrue(self._validate(self.session_1, 'Ticket 2')['valid'])
+        self.assertTrue(self._validate(self.session_1, 'Ticket 1')['valid'])
+        self.assertFalse(self._validate(self.session_1, 'Ticket 3')['valid'])
+
+        Reservation._release_order_holds(['Ticket 1'])
+        self.assertEqual(Reservation.search([]).mapped('order_uid'), ['Ticket 2'])
+        self.assertTrue(self._validate(self.session_2, 'Ticket 4')['valid'])
+        self.assertFalse(self._validate(self.session_2, 'Ticket 5')['valid'])
+
+    def test_sublocation_hold_is_counted(self):
+        """Holds on a location inside the checked tree reduce its availability"""
+        shelf = self.env['stock.location'].create({
+            'name': 'Reservation Shelf',
+            'location_id': self.stock_location.id,
+        })
+        self.env['pos.bom.reservation']._hold_components(self.session_1, shelf, {self.component.id: 1.0})
+
+        self.assertFalse(self._validate(self.session_2)['valid'])
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+from odoo.tests.common import TransactionCase
+
+
+class TestBOMStockNotification(TransactionCase):
+    """Test suite for the bus notification of BOM component stock changes"""
+
+    def setUp(self):
+        super().setUp()
+
+        self.stock_location = self.env.ref('stock.stock_location_stock')
+        self.component = self.env['product.product'].create({
+            'name': 'Notified Component',
+            'type': 'product',
+        })
+        self.other_product = self.env['product.product'].create({
+            'name': 'Unrelated Product',
+            'type': 'product',
+        })
+
+        self.product = self.env['product.product'].create({
+            'name': 'Notified BOM Product',
+            'type': 'product',
+            'use_bom_in_pos': True,
+        })
+        self.env['mrp.bom'].create({
+            'product_tmpl_id': self.product.product_tmpl_id.id,
+            'product_qty': 1.0,
+            'bom_line_ids': [(0, 0, {
+                'product_id': self.component.id,
+                'product_qty': 1.0,
+            })],
+        })
+
+        self.pos_config = self.env['pos.config'].create({'name': 'Notified POS Config'})
+        self.pos_session = self.env['pos.session'].create({'config_id': self.pos_config.id})
+        self.pos_session.state = 'opened'
+
+        self.Delta = self.env['pos.bom.stock.delta']
+        self.Delta.search([]).unlink()
+        # Changes are due as soon as they are recorded, unless a test sets a delay
+        self.env['ir.config_parameter'].sudo().set_param('pos_bom_integration.stock_notification_throttle', 0)
+
+    def _get_notified_deltas(self):
+        """Helper method to read the deltas sent to the POS config channel"""
+        channel = self.Delta._get_session_channel(self.pos_config)
+        messages = self.env['bus.bus'].search([('channel', 'like', channel)])
+        return [
+            delta
+            for message in messages
+            for delta in json.loads(message.message)['payload']['deltas']
+        ]
+
+    def test_component_changes_are_batched(self):
+        """Several changes of a component are sent as one delta"""
+        Quant = self.env['stock.quant']
+        Quant._update_available_quantity(self.component, self.stock_location, 5.0)
+        Quant._update_available_quantity(self.component, self.stock_location, -2.0)
+        Quant._update_available_quantity(self.other_product, self.stock_location, 4.0)
+
+        self.assertEqual(set(self.Delta.search([]).product_id.ids), {self.component.id})
+
+        self.Delta._cron_notify_stock_deltas()
+
+        self.assertEqual(self._get_notified_deltas(), [[self.component.id, 3.0, False]])
+        self.assertFalse(self.Delta.search([]))
+
+    def test_origin_session_is_kept(self):
+        """Changes made while syncing a session carry that session"""
+        self.env['stock.quant'].with_context(
+            pos_bom_origin_session_id=self.pos_session.id
+        )._update_available_quantity(self.component, self.stock_location, 1.0)
+
+        self.Delta._cron_notify_stock_deltas()
+
+        self.assertEqual(self._get_notified_deltas(), [[self.component.id, 1.0, self.pos_session.id]])
+
+    def test_throttle_is_per_location(self):
+        """A location waiting for its delay does not hold back the others"""
+        self.env['ir.config_parameter'].sudo().set_param('pos_bom_integration.stock_notification_throttle', 60)
+        shelf = self.env['stock.location'].create({'name': 'Shelf', 'location_id': self.stock_location.id})
+        Quant = self.env['stock.quant']
+        Quant._update_available_quantity(self.component, self.stock_location, 2.0)
+        Quant._update_available_quantity(self.component, shelf, 1.0)
+
+        # Only the changes of the stock location are older than the delay
+        self.Delta.flush_model()
+        self.env.cr.execute("""
+            UPDATE pos_bom_stock_delta
+               SET create_date = create_date - interval '2 minutes'
+             WHERE location_id = %s
+        """, [self.stock_location.id])
+        self.Delta.invalidate_model(['create_date'])
+
+        self.Delta._cron_notify_stock_deltas()
+
+        self.assertEqual(self._get_notified_deltas(), [[self.component.id, 2.0, False]])
+        self.assertEqual(self.Delta.search([]).location_id, shelf)
+
+    def test_channel_is_not_guessable(self):
+        """The stock channel of a POS config is named after its access token"""
+        channel = self.Delta._get_session_channel(self.pos_config)
+
+        self.assertTrue(self.pos_config.access_token)
+        self.assertIn(self.pos_config.access_token, channel)
+        self.assertNotEqual(channel, f'pos_bom_stock_{self.pos_config.id}')
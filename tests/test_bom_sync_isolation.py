@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+import json
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.exceptions import UserError
+from odoo.tests.common import TransactionCase
+
+
+class TestBOMSyncIsolation(TransactionCase):
+    """Test suite for the parking of POS orders failing to sync"""
+
+    def setUp(self):
+        super().setUp()
+
+        self.component = self.env['product.product'].create({
+            'name': 'Scarce Component',
+            'type': 'product',
+        })
+
+        self.product = self.env['product.product'].create({
+            'name': 'Scarce BOM Product',
+            'type': 'product',
+            'use_bom_in_pos': True,
+        })
+        self.env['mrp.bom'].create({
+            'product_tmpl_id': self.product.product_tmpl_id.id,
+            'product_qty': 1.0,
+            'bom_line_ids': [(0, 0, {
+                'product_id': self.component.id,
+                'product_qty': 1.0,
+            })],
+        })
+
+        self.pos_config = self.env['pos.config'].create({'name': 'Isolated POS Config'})
+        self.pos_session = self.env['pos.session'].create({'config_id': self.pos_config.id})
+
+    def _ui_order(self, uid):
+        """Helper method to build a UI order selling one BOM product"""
+        return {
+            'id': uid,
+            'data': {
+                'uid': uid,
+                'name': f'Order {uid}',
+                'pos_session_id': self.pos_session.id,
+                'lines': [[0, 0, {'product_id': self.product.id, 'qty': 1}]],
+            },
+        }
+
+    def _full_ui_order(self, uid):
+        """Helper method to build a UI order the base create_from_ui can create"""
+        order = self._ui_order(uid)
+        order['data'].update({
+            'user_id': self.env.uid,
+            'partner_id': False,
+            'sequence_number': 1,
+            'creation_date': fields.Datetime.to_string(fields.Datetime.now()),
+            'fiscal_position_id': False,
+            'pricelist_id': self.pos_config.pricelist_id.id,
+            'amount_paid': 0.0,
+            'amount_total': 0.0,
+            'amount_tax': 0.0,
+            'amount_return': 0.0,
+            'statement_ids': [],
+            'lines': [[0, 0, {
+                'product_id': self.product.id,
+                'qty': 1,
+                'price_unit': 0.0,
+                'price_subtotal': 0.0,
+                'price_subtotal_incl': 0.0,
+                'discount': 0,
+                'tax_ids': [[6, False, []]],
+            }]],
+        })
+        return order
+
+    def _add_stock(self, quantity):
+        """Helper method to add stock of the component"""
+        self.env['stock.quant']._update_available_quantity(
+            self.component, self.env.ref('stock.stock_location_stock'), quantity
+        )
+
+    def test_breaching_order_is_parked(self):
+        """An order breaching BOM stock is parked and returned with its reasons"""
+        order = self._ui_order('00001-001-0001')
+
+        result = self.env['pos.order'].create_from_ui([order])
+
+        self.assertEqual(len(result), 1)
+        self.assertFalse(result[0]['id'])
+        self.assertEqual(result[0]['pos_reference'], 'Order 00001-001-0001')
+        failure = result[0]['bom_failure']
+        self.assertIn('Scarce Component', failure['reason'])
+        self.assertEqual(failure['errors'][0]['component_id'], self.component.id)
+
+        parked = self.env['pos.bom.parked.order'].search([('uid', '=', '00001-001-0001')])
+        self.assertEqual(parked.state, 'parked')
+        self.assertEqual(parked.session_id, self.pos_session)
+        self.assertEqual(json.loads(parked.order_data), order)
+
+    def test_parked_again_keeps_record(self):
+        """A parked order failing again updates its record"""
+        order = self._ui_order('00001-001-0002')
+        self.env['pos.order'].create_from_ui([order])
+        self.env['pos.order'].create_from_ui([order])
+
+        parked = self.env['pos.bom.parked.order'].search([('uid', '=', '00001-001-0002')])
+        self.assertEqual(len(parked), 1)
+
+    def test_failing_order_is_parked_alone(self):
+        """An order failing inside the base sync is parked, the others are created"""
+        self._add_stock(10.0)
+        orders = [self._full_ui_order(uid) for uid in ('00001-001-0003', '00001-001-0004', '00001-001-0005')]
+        PosOrder = self.registry['pos.order']
+        process_order = PosOrder._process_order
+
+        def failing_process_order(model, order, draft, existing_order):
+            if order['data']['uid'] == '00001-001-0004':
+                raise UserError('Sync failed')
+            return process_order(model, order, draft, existing_order)
+
+        with patch.object(PosOrder, '_process_order', failing_process_order):
+            result = self.env['pos.order'].create_from_ui(orders)
+
+        self.assertEqual(
+            {entry['pos_reference'] for entry in result if entry['id']},
+            {'Order 00001-001-0003', 'Order 00001-001-0005'},
+        )
+        failures = [entry for entry in result if not entry['id']]
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(failures[0]['pos_reference'], 'Order 00001-001-0004')
+        parked = self.env['pos.bom.parked.order'].search([('uid', '=', '00001-001-0004')])
+        self.assertEqual(parked.state, 'parked')
+        self.assertIn('Sync failed', parked.reason)
+
+    def test_parked_order_synced_later(self):
+        """A parked order synced again by the POS is marked as synced"""
+        order = self._full_ui_order('00001-001-0006')
+        self.env['pos.order'].create_from_ui([order])
+        parked = self.env['pos.bom.parked.order'].search([('uid', '=', '00001-001-0006')])
+        self.assertEqual(parked.state, 'parked')
+
+        self._add_stock(1.0)
+        result = self.env['pos.order'].create_from_ui([order])
+
+        self.assertEqual(parked.state, 'synced')
+        self.assertEqual(parked.pos_order_id.id, result[0]['id'])
+
+    def test_draft_order_is_not_checked(self):
+        """Draft orders consume no stock and are never parked"""
+        result = self.env['pos.order'].create_from_ui([self._full_ui_order('00001-001-0007')], draft=True)
+
+        self.assertTrue(result[0]['id'])
+        self.assertFalse(self.env['pos.bom.parked.order'].search([('uid', '=', '00001-001-0007')]))